@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from aichat.tokens import estimate_tokens
+
+
+class PromptSection:
+    """프롬프트의 줄일 수 있는 구역 하나
+
+    variants는 가장 자세한 것부터 점점 짧아지는 대체 텍스트 목록이고, priority가
+    낮은 구역부터 다음 variant로 줄여 나갑니다.
+    """
+
+    def __init__(self, name, variants, priority):
+        self.name = name
+        self.variants = list(variants) or [""]
+        self.priority = priority
+        self.level = 0
+        self.tokens = estimate_tokens(self.variants[0])
+
+    @property
+    def text(self):
+        return self.variants[self.level]
+
+    def can_shrink(self):
+        return self.level + 1 < len(self.variants)
+
+    def shrink(self):
+        self.level += 1
+        self.tokens = estimate_tokens(self.text)
+
+
+class BudgetReport:
+    """예산 맞추기 결과 (구역별 토큰 수, 줄인 구역, 예산 초과 여부)"""
+
+    def __init__(self, budget, fixed_tokens, sections):
+        self.budget = budget
+        self.fixed_tokens = fixed_tokens
+        self.section_tokens = {s.name: s.tokens for s in sections}
+        self.trimmed = {s.name: s.level for s in sections if s.level}
+        self.total_tokens = fixed_tokens + sum(self.section_tokens.values())
+        self.over_budget = self.total_tokens > budget
+
+
+class PromptBudgeter:
+    """모델별 토큰 예산에 맞게 우선순위가 낮은 구역부터 줄이는 도구"""
+
+    def __init__(self, budget):
+        self.budget = budget
+
+    def fit(self, sections, fixed_tokens=0):
+        """sections를 제자리에서 줄이고 ({이름: 텍스트}, BudgetReport) 반환"""
+        total = fixed_tokens + sum(s.tokens for s in sections)
+        by_priority = sorted(sections, key=lambda s: s.priority)
+        while total > self.budget:
+            section = next((s for s in by_priority if s.can_shrink()), None)
+            if section is None:
+                break  # 더 줄일 수 있는 구역이 없음 (고정 부분만으로 예산 초과)
+            before = section.tokens
+            section.shrink()
+            total += section.tokens - before
+        report = BudgetReport(self.budget, fixed_tokens, sections)
+        if report.over_budget:
+            print(f"⚠️ 프롬프트가 예산을 초과합니다: {report.total_tokens}/{self.budget} 토큰")
+        return {s.name: s.text for s in sections}, report
+
+
+def emotion_variants(emotions, labels, keep_counts=(24, 12, 6)):
+    """감정 목록을 중립(50)에서 먼 순서로 남기며 점점 줄인 텍스트 목록"""
+    items = list(emotions.items())
+
+    def distance(item):
+        try:
+            return abs(float(item[1]) - 50)
+        except (TypeError, ValueError):
+            return 0
+
+    def render(selected):
+        return "\n".join(f"{labels.get(emotion) or emotion + ': '}{value}%" for emotion, value in selected)
+
+    variants = [render(items)]
+    ranked = sorted(items, key=distance, reverse=True)
+    for count in keep_counts:
+        if count < len(items):
+            keep = {emotion for emotion, _ in ranked[:count]}
+            variants.append(render([item for item in items if item[0] in keep]))
+    return variants
+
+
+def history_variants(lines, keep_counts=(3, 1), max_line_chars=160):
+    """최근 대화 기록을 오래된 줄부터 버리고, 마지막에는 긴 줄을 잘라낸 텍스트 목록"""
+    lines = list(lines)
+    variants = ["\n".join(lines)]
+    for count in keep_counts:
+        if count < len(lines):
+            variants.append("\n".join(lines[-count:]))
+    if lines:
+        variants.append("\n".join(
+            line if len(line) <= max_line_chars else line[:max_line_chars] + "…" for line in lines[-1:]
+        ))
+    variants.append("")
+    return variants
+
+
+class TurnRecord:
+    """대화 한 턴의 프롬프트/응답 크기와 지연 시간"""
+
+    def __init__(self, npc_name, model, report: BudgetReport):
+        self.npc_name = npc_name
+        self.model = model
+        self.report = report
+        self.started = time.monotonic()
+        self.latency = None
+        self.response_tokens = None
+        self.usage = {}
+
+    def as_dict(self):
+        return {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "npc": self.npc_name,
+            "model": self.model,
+            "prompt_tokens_est": self.report.total_tokens,
+            "fixed_tokens_est": self.report.fixed_tokens,
+            "sections_est": self.report.section_tokens,
+            "trimmed": self.report.trimmed,
+            "over_budget": self.report.over_budget,
+            "response_tokens_est": self.response_tokens,
+            "prompt_tokens": self.usage.get("promptTokenCount"),
+            "response_tokens": self.usage.get("candidatesTokenCount"),
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+        }
+
+
+class PromptMetrics:
+    """턴별 프롬프트/응답 크기 기록 (최근 max_records개 보관, log_path가 있으면 JSONL로도 저장)
+
+    finish()는 메모리에만 기록하고, 파일에는 백그라운드 스레드가 flush_interval마다
+    (그리고 close() 시에) 모아서 씁니다. 파일이 max_bytes를 넘으면 log_path.1로
+    돌려 두고 새로 시작하므로 디스크에는 최대 두 개만 남습니다.
+    """
+
+    def __init__(self, max_records=200, log_path=None, flush_interval=5.0, max_bytes=1024 * 1024):
+        self.records = deque(maxlen=max_records)
+        self.log_path = log_path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer = None
+        if log_path:
+            self._writer = threading.Thread(target=self._run_writer, name="prompt-metrics-writer", daemon=True)
+            self._writer.start()
+
+    def begin(self, npc_name, model, report: BudgetReport) -> TurnRecord:
+        return TurnRecord(npc_name, model, report)
+
+    def finish(self, turn: TurnRecord, response_text, usage=None):
+        """응답을 받은 뒤 호출, 크기와 지연 시간을 기록"""
+        turn.latency = time.monotonic() - turn.started
+        turn.response_tokens = estimate_tokens(response_text or "")
+        turn.usage = usage or {}
+        record = turn.as_dict()
+        with self._lock:
+            self.records.append(record)
+            if self.log_path:
+                self._pending.append(record)
+        print(f"📏 프롬프트 ~{record['prompt_tokens_est']}토큰, 응답 ~{record['response_tokens_est']}토큰, "
+              f"{record['latency']}초 ({turn.npc_name})")
+        return record
+
+    def flush(self):
+        """모아 둔 기록을 파일에 추가 (max_bytes를 넘었으면 먼저 log_path.1로 교체)"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                if os.path.exists(self.log_path) and os.path.getsize(self.log_path) >= self.max_bytes:
+                    os.replace(self.log_path, self.log_path + ".1")
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in pending))
+            except Exception as e:
+                print(f"⚠️ 프롬프트 통계 기록 실패: {e}")
+
+    def _run_writer(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """백그라운드 기록 중지 후 남은 기록 저장"""
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join(timeout=self.flush_interval + 1)
+            self.flush()
+
+    def snapshot(self) -> dict:
+        """최근 턴들의 평균 크기와 지연 시간"""
+        with self._lock:
+            records = list(self.records)
+        if not records:
+            return {"turns": 0}
+        count = len(records)
+        return {
+            "turns": count,
+            "avg_prompt_tokens_est": round(sum(r["prompt_tokens_est"] for r in records) / count, 1),
+            "avg_response_tokens_est": round(sum(r["response_tokens_est"] or 0 for r in records) / count, 1),
+            "avg_latency": round(sum(r["latency"] or 0 for r in records) / count, 3),
+            "trimmed_turns": sum(1 for r in records if r["trimmed"]),
+            "over_budget_turns": sum(1 for r in records if r["over_budget"]),
+        }
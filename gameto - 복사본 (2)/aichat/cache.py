@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+# 프롬프트마다 달라지지만 응답에는 영향이 거의 없는 값 (dialogue.txt의 {current_time} 등)
+_TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(?::\d{2})?")
+_SPACES_RE = re.compile(r"[ \t　]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """캐시 키용 프롬프트 정규화 (유니코드 NFC, 공백 정리, 시각 제거)"""
+    text = unicodedata.normalize("NFC", prompt)
+    text = _TIMESTAMP_RE.sub("<time>", text)
+    text = "\n".join(_SPACES_RE.sub(" ", line).strip() for line in text.splitlines())
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()
+
+
+class ResponseCache:
+    """LLM 응답 캐시 (메모리 LRU + TTL, 선택적 sqlite 디스크 계층)
+
+    put()은 메모리에만 넣고 디스크 기록은 대기열에 모아 두었다가 백그라운드
+    스레드가 flush_interval마다(그리고 close() 시에) 한 번의 커밋으로 씁니다.
+    이벤트 루프에서는 get_async()를 쓰세요. 메모리에 없을 때만 디스크 조회를
+    실행기 스레드로 넘기므로 루프 스레드에서 sqlite I/O가 일어나지 않습니다.
+    """
+
+    def __init__(self, max_entries=512, ttl=600.0, disk_path=None, disk_ttl=7 * 24 * 3600.0, flush_interval=1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_ttl = disk_ttl
+        self.flush_interval = flush_interval
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._pending = {}             # 아직 디스크에 쓰지 않은 key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0}
+        self._db = None
+        self._writer = None
+        self._stop = threading.Event()
+        if disk_path:
+            self._open_disk(disk_path)
+        if self._db is not None:
+            self._writer = threading.Thread(target=self._run_writer, name="response-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _open_disk(self, path):
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.disk_ttl,))
+            self._db.commit()
+            print(f"✅ 응답 캐시 디스크 계층 사용: {path}")
+        except Exception as e:
+            print(f"⚠️ 응답 캐시 디스크 계층을 열 수 없어 메모리만 사용합니다: {e}")
+            self._db = None
+
+    @staticmethod
+    def make_key(model: str, prompt: str, extra: str = "") -> str:
+        """모델 이름 + 정규화된 프롬프트의 해시"""
+        raw = f"{model}\0{extra}\0{normalize_prompt(prompt)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """캐시된 응답 반환 (없거나 만료되면 None, 디스크 조회가 필요하면 호출한 스레드에서 읽음)"""
+        found, value = self._get_memory(key)
+        if found:
+            return value
+        return self._get_disk(key)
+
+    async def get_async(self, key):
+        """get()과 같지만 디스크 조회는 실행기 스레드에서 (이벤트 루프용)"""
+        found, value = self._get_memory(key)
+        if found:
+            return value
+        return await asyncio.get_running_loop().run_in_executor(None, self._get_disk, key)
+
+    def _get_memory(self, key):
+        """(찾았는지, 값) - 메모리에 없고 디스크를 볼 필요도 없으면 실패로 집계"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if time.time() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return True, value
+                del self._entries[key]
+                self.stats["expired"] += 1
+            if self._db is None:
+                self.stats["misses"] += 1
+                return True, None
+            return False, None
+
+    def _get_disk(self, key):
+        with self._lock:
+            # 메모리에서 밀려났지만 아직 디스크에 쓰지 않은 항목
+            row = self._pending.get(key)
+        if row is None:
+            try:
+                with self._db_lock:
+                    if self._db is not None:
+                        row = self._db.execute(
+                            "SELECT value, stored_at FROM responses WHERE key = ?", (key,)
+                        ).fetchone()
+            except Exception as e:
+                print(f"⚠️ 응답 캐시 디스크 조회 오류: {e}")
+                row = None
+        with self._lock:
+            if row and time.time() - row[1] <= self.disk_ttl:
+                self._store_memory(key, row[0], time.time())
+                self.stats["disk_hits"] += 1
+                return row[0]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, value: str):
+        """응답 저장 (디스크에는 백그라운드에서 모아서 기록)"""
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, value, now)
+            self.stats["stores"] += 1
+            if self._db is not None:
+                self._pending[key] = (value, now)
+
+    def flush(self):
+        """대기 중인 디스크 기록을 한 번의 커밋으로 저장"""
+        with self._db_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending or self._db is None:
+                return
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO responses (key, value, stored_at) VALUES (?, ?, ?)",
+                    [(key, value, stored_at) for key, (value, stored_at) in pending.items()]
+                )
+                self._db.commit()
+            except Exception as e:
+                print(f"⚠️ 응답 캐시 디스크 저장 오류: {e}")
+                with self._lock:
+                    # 다음 주기에 다시 시도 (그 사이 새로 들어온 값이 우선)
+                    for key, row in pending.items():
+                        self._pending.setdefault(key, row)
+
+    def _run_writer(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _store_memory(self, key, value, stored_at):
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._db_lock:
+            with self._lock:
+                self._entries.clear()
+                self._pending.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def snapshot(self) -> dict:
+        """적중/실패 통계"""
+        with self._lock:
+            data = dict(self.stats)
+            lookups = data["hits"] + data["disk_hits"] + data["misses"]
+            data["size"] = len(self._entries)
+            data["hit_rate"] = round((data["hits"] + data["disk_hits"]) / lookups, 3) if lookups else 0.0
+            return data
+
+    def close(self):
+        """백그라운드 기록 중지 후 남은 항목을 저장하고 디스크 계층 닫기"""
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join(timeout=self.flush_interval + 1)
+        self.flush()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,162 @@
+import asyncio
+import base64
+import json
+import threading
+
+import aiohttp
+
+
+API_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+# 요청이 백엔드에 닿지 못했거나 중간에 끊긴 오류 (서킷 브레이커에 실패로 기록)
+CONNECTION_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+
+
+class GeminiAPIError(Exception):
+    """Gemini REST API 오류 (HTTP 상태 코드 포함)"""
+
+    def __init__(self, status, message, payload=None):
+        super().__init__(f"[{status}] {message}")
+        self.status = status
+        self.message = message
+        self.payload = payload or {}
+
+
+class AsyncGeminiClient:
+    """하나의 이벤트 루프와 keep-alive 커넥션 풀을 공유하는 Gemini 비동기 클라이언트
+
+    이벤트 루프는 전용 스레드 하나에서만 돌고, 동시에 진행되는 요청 수는
+    max_in_flight 로 제한됩니다. 다른 스레드에서는 submit()/run()으로
+    코루틴을 넘기면 됩니다.
+    """
+
+    def __init__(self, max_in_flight=8, pool_size=None, request_timeout=60, keepalive_timeout=30):
+        self.max_in_flight = max_in_flight
+        self.pool_size = pool_size or max_in_flight
+        self.request_timeout = request_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.in_flight = 0
+
+        self.loop = asyncio.new_event_loop()
+        self._session = None
+        self._semaphore = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="gemini-client", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._ready.set()
+        self.loop.run_forever()
+
+    async def _get_session(self):
+        """커넥션 풀을 가진 세션을 최초 요청 시 생성"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+        return self._session
+
+    async def generate_content(self, model: str, api_key: str, body: dict) -> dict:
+        """generateContent 호출 후 응답 JSON 반환"""
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                session = await self._get_session()
+                url = f"{API_BASE_URL}/models/{model}:generateContent"
+                async with session.post(url, json=body, headers={"x-goog-api-key": api_key}) as resp:
+                    data = await resp.json(content_type=None)
+                    if resp.status != 200:
+                        error = (data or {}).get("error", {}) if isinstance(data, dict) else {}
+                        raise GeminiAPIError(resp.status, error.get("message", resp.reason), data)
+                    return data
+            finally:
+                self.in_flight -= 1
+
+    async def stream_generate_content(self, model: str, api_key: str, body: dict):
+        """streamGenerateContent(SSE) 호출, 도착하는 응답 조각(JSON)을 순서대로 yield"""
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                session = await self._get_session()
+                url = f"{API_BASE_URL}/models/{model}:streamGenerateContent"
+                async with session.post(url, params={"alt": "sse"}, json=body,
+                                        headers={"x-goog-api-key": api_key}) as resp:
+                    if resp.status != 200:
+                        data = await resp.json(content_type=None)
+                        error = (data or {}).get("error", {}) if isinstance(data, dict) else {}
+                        raise GeminiAPIError(resp.status, error.get("message", resp.reason), data)
+                    async for raw_line in resp.content:
+                        line = raw_line.decode("utf-8").strip()
+                        if not line.startswith("data:"):
+                            continue
+                        payload = line[len("data:"):].strip()
+                        if payload:
+                            yield json.loads(payload)
+            finally:
+                self.in_flight -= 1
+
+    def submit(self, coro):
+        """다른 스레드에서 코루틴을 루프에 넘기고 concurrent.futures.Future 반환"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """코루틴을 루프에서 실행하고 결과를 기다림 (루프 스레드에서는 호출 금지)"""
+        return self.submit(coro).result(timeout)
+
+    def close(self):
+        """세션을 닫고 이벤트 루프 종료"""
+        if not self.loop.is_running():
+            return
+
+        async def _close():
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+
+        try:
+            self.run(_close(), timeout=5)
+        except Exception as e:
+            print(f"⚠️ 클라이언트 세션 종료 중 오류: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+def build_text_request(prompt: str, generation_config=None) -> dict:
+    """텍스트 프롬프트용 요청 본문 생성"""
+    body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+    if generation_config:
+        body["generationConfig"] = generation_config
+    return body
+
+
+def extract_text(data: dict) -> str:
+    """응답 JSON에서 텍스트 파트를 이어붙여 반환"""
+    texts = []
+    for candidate in data.get("candidates", [])[:1]:
+        for part in candidate.get("content", {}).get("parts", []):
+            if "text" in part:
+                texts.append(part["text"])
+    return "".join(texts)
+
+
+def extract_usage(data: dict) -> dict:
+    """응답 JSON의 usageMetadata (promptTokenCount, candidatesTokenCount 등, 없으면 빈 dict)"""
+    return dict(data.get("usageMetadata") or {})
+
+
+def extract_image(data: dict):
+    """응답 JSON에서 첫 번째 이미지 파트를 bytes로 반환 (없으면 None)"""
+    for candidate in data.get("candidates", [])[:1]:
+        for part in candidate.get("content", {}).get("parts", []):
+            inline = part.get("inlineData") or part.get("inline_data")
+            if inline and inline.get("data"):
+                return base64.b64decode(inline["data"])
+    return None
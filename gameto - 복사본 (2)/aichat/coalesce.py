@@ -0,0 +1,97 @@
+class _PendingInput:
+    def __init__(self):
+        self.lines = []
+        self.timer = None
+        self.in_flight = False
+
+
+class InputCoalescer:
+    """빠르게 연달아 들어온 플레이어 입력을 한 번의 NPC 턴 요청으로 묶는 도구
+
+    입력은 (대화 세대, NPC) 키별로 모입니다. 마지막 입력 후 debounce_ms 동안 더
+    들어오지 않으면 dispatch(key, lines, done)로 한 번에 보내고, 그 턴이 끝나
+    done()이 호출되기 전까지 들어온 입력은 다음 요청으로 모아 둡니다.
+
+    schedule(ms, callback) -> id 와 cancel(id)는 UI 스레드 타이머(root.after /
+    root.after_cancel)이며, add()/done()도 UI 스레드에서만 호출해야 합니다.
+    플레이어 입력이 아닌 턴(NPC 첫마디 등)을 보낼 때는 hold(key)로 키를 진행 중으로
+    표시하고, 그 턴이 끝나면 돌려받은 done()을 호출하세요.
+    is_live(key)를 넘기면 지난 대화 세대의 키는 진행 중인 턴이 있더라도 버려서,
+    done()이 오지 않은 턴 때문에 입력이 계속 묶여 있지 않게 합니다.
+    """
+
+    def __init__(self, schedule, cancel, dispatch, debounce_ms=400, is_live=None):
+        self.schedule = schedule
+        self.cancel = cancel
+        self.dispatch = dispatch
+        self.is_live = is_live
+        self.debounce_ms = debounce_ms
+        self._inputs = {}
+        self.stats = {"lines": 0, "requests": 0}
+
+    def add(self, key, line):
+        """입력 한 줄 추가 (진행 중인 턴이 없으면 디바운스 타이머를 다시 시작)"""
+        self._drop_stale()
+        pending = self._inputs.setdefault(key, _PendingInput())
+        pending.lines.append(line)
+        self.stats["lines"] += 1
+        if not pending.in_flight:
+            self._restart_timer(key, pending)
+
+    def hold(self, key):
+        """다른 경로로 보낸 턴이 끝날 때까지 key를 진행 중으로 표시, 끝나면 호출할 done() 반환"""
+        self._drop_stale()
+        pending = self._inputs.setdefault(key, _PendingInput())
+        if pending.timer is not None:
+            self.cancel(pending.timer)
+            pending.timer = None
+        pending.in_flight = True
+        return lambda: self._done(key)
+
+    def reset(self, keep=None):
+        """keep 이외의 키에 모인 입력과 타이머를 버림 (대화 상대/위치가 바뀌었을 때)"""
+        for key in [k for k in self._inputs if k != keep]:
+            pending = self._inputs.pop(key)
+            if pending.timer is not None:
+                self.cancel(pending.timer)
+
+    def _drop_stale(self):
+        if self.is_live is None:
+            return
+        for key in [k for k in self._inputs if not self.is_live(k)]:
+            pending = self._inputs.pop(key)
+            if pending.timer is not None:
+                self.cancel(pending.timer)
+
+    def _restart_timer(self, key, pending):
+        if pending.timer is not None:
+            self.cancel(pending.timer)
+        pending.timer = self.schedule(self.debounce_ms, lambda: self._flush(key))
+
+    def _flush(self, key):
+        pending = self._inputs.get(key)
+        if pending is None:
+            return
+        pending.timer = None
+        if self.is_live is not None and not self.is_live(key):
+            del self._inputs[key]
+            return
+        if pending.in_flight or not pending.lines:
+            return
+        lines, pending.lines = pending.lines, []
+        pending.in_flight = True
+        self.stats["requests"] += 1
+        if len(lines) > 1:
+            print(f"🧩 플레이어 입력 {len(lines)}줄을 한 번의 요청으로 묶음")
+        self.dispatch(key, lines, lambda: self._done(key))
+
+    def _done(self, key):
+        pending = self._inputs.get(key)
+        if pending is None:
+            return
+        pending.in_flight = False
+        if pending.lines:
+            # 턴이 진행되는 동안 들어온 입력은 다음 요청으로
+            self._restart_timer(key, pending)
+        else:
+            del self._inputs[key]
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from aichat.cache import normalize_prompt
+
+
+class ImageCache:
+    """생성 이미지의 내용 주소 기반 디스크 캐시
+
+    키는 모델 + 정규화된 프롬프트 + 생성 파라미터의 해시이고, 이미지는
+    cache_dir/키 앞 두 글자/키.bin 파일로 저장됩니다. index.json에 파일 크기,
+    내용 해시(sha256), 마지막 사용 시각을 기록해 두고 읽을 때마다 해시로
+    손상 여부를 확인합니다. 전체 크기가 max_bytes를 넘으면 가장 오래 쓰지 않은
+    이미지부터 지웁니다. 게임 밖에서 seed()로 미리 채워 둘 수도 있습니다.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir=os.path.join("cache", "images"), max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index = {}   # 키 -> {"size", "sha256", "created", "last_used"}
+        self._total = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "corrupt": 0}
+        self._load_index()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, params=None) -> str:
+        """모델 + 정규화된 프롬프트 + 파라미터(JSON)의 sha256"""
+        raw = json.dumps(
+            {"model": model, "prompt": normalize_prompt(prompt), "params": params or {}},
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
+
+    def _load_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"⚠️ 이미지 캐시 색인을 읽을 수 없어 새로 시작합니다: {e}")
+            return
+        # 파일이 사라진 항목은 색인에서 제외
+        self._index = {key: meta for key, meta in index.items() if os.path.exists(self._path(key))}
+        self._total = sum(meta["size"] for meta in self._index.values())
+        self._dirty = len(self._index) != len(index)
+        print(f"✅ 이미지 캐시 로드: {len(self._index)}개, {self._total / 1024 / 1024:.1f}MB")
+
+    def _save_index(self):
+        """색인을 임시 파일에 쓴 뒤 교체 (호출자가 잠금을 잡고 있어야 함)"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, path)
+        self._dirty = False
+
+    def get(self, key):
+        """캐시된 이미지 bytes (없거나 손상되었으면 None)"""
+        with self._lock:
+            meta = self._index.get(key)
+            if meta is None:
+                self.stats["misses"] += 1
+                return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            data = None
+        with self._lock:
+            if data is None or len(data) != meta["size"] or hashlib.sha256(data).hexdigest() != meta["sha256"]:
+                print(f"⚠️ 손상된 캐시 이미지를 버립니다: {key[:12]}")
+                self.stats["corrupt"] += 1
+                self.stats["misses"] += 1
+                self._remove(key)
+                return None
+            meta["last_used"] = time.time()
+            self._dirty = True
+            self.stats["hits"] += 1
+            return data
+
+    def put(self, key, data: bytes):
+        """이미지 저장 후 용량 초과분 정리"""
+        if not data:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ 이미지 캐시 저장 실패: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            old = self._index.get(key)
+            if old is not None:
+                self._total -= old["size"]
+            self._index[key] = {
+                "size": len(data),
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "created": now,
+                "last_used": now,
+            }
+            self._total += len(data)
+            self.stats["stores"] += 1
+            self._evict()
+            try:
+                self._save_index()
+            except Exception as e:
+                print(f"⚠️ 이미지 캐시 색인 저장 실패: {e}")
+
+    def seed(self, model: str, prompt: str, data: bytes, params=None) -> str:
+        """게임 밖에서 미리 만든 이미지를 캐시에 넣음 (키 반환)"""
+        key = self.make_key(model, prompt, params)
+        self.put(key, data)
+        return key
+
+    def _remove(self, key):
+        meta = self._index.pop(key, None)
+        if meta is None:
+            return
+        self._total -= meta["size"]
+        self._dirty = True
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_used"]):
+            if self._total <= self.max_bytes:
+                break
+            self._remove(key)
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.stats, entries=len(self._index), bytes=self._total)
+
+    def close(self):
+        """마지막 사용 시각 등 바뀐 색인 저장"""
+        with self._lock:
+            if self._dirty:
+                try:
+                    self._save_index()
+                except Exception as e:
+                    print(f"⚠️ 이미지 캐시 색인 저장 실패: {e}")
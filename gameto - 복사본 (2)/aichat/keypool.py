@@ -0,0 +1,182 @@
+import asyncio
+import re
+import threading
+import time
+
+
+def is_rate_limit_error(error) -> bool:
+    """429 / 할당량 초과 오류인지 확인"""
+    if getattr(error, "status", None) == 429:
+        return True
+    text = str(error)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text or "quota" in text.lower()
+
+
+def parse_retry_delay(error):
+    """오류 응답의 RetryInfo(retryDelay: "23s")에서 대기 시간(초) 추출"""
+    payload = getattr(error, "payload", None) or {}
+    details = payload.get("error", {}).get("details", []) if isinstance(payload, dict) else []
+    for detail in details:
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if delay:
+            match = re.match(r"^\s*([\d.]+)s\s*$", str(delay))
+            if match:
+                return float(match.group(1))
+    return None
+
+
+class TokenBucket:
+    """키 하나의 요청 속도를 제한하는 토큰 버킷"""
+
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, now) -> float:
+        self._refill(now)
+        return self.tokens
+
+    def take(self, now) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now) -> float:
+        """토큰 하나가 생길 때까지 남은 시간"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class KeyState:
+    """API 키 하나의 상태 (토큰 버킷, 쿨다운, 통계)"""
+
+    def __init__(self, index, api_key, bucket):
+        self.index = index
+        self.api_key = api_key
+        self.bucket = bucket
+        self.cooldown_until = 0.0
+        self.rate_limit_strikes = 0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def label(self):
+        return f"키 #{self.index + 1}"
+
+
+class KeyPool:
+    """여러 API 키에 요청을 동시에 분산하는 스케줄러
+
+    키마다 토큰 버킷을 두고, 429/할당량 오류가 나면 해당 키만 쿨다운시킨 뒤
+    쿨다운이 아니고 토큰이 남은 키 중 가장 건강한 키로 요청을 보냅니다.
+    """
+
+    def __init__(self, api_keys, requests_per_minute=15, burst=None, base_cooldown=30.0, max_cooldown=300.0):
+        capacity = burst or max(1, requests_per_minute // 4)
+        self.keys = [
+            KeyState(i, key, TokenBucket(requests_per_minute / 60.0, capacity))
+            for i, key in enumerate(api_keys)
+        ]
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _score(self, state, now):
+        # 실패가 적고, 진행 중 요청이 적고, 토큰이 많을수록 건강한 키
+        return (state.consecutive_failures, state.in_flight, -state.bucket.available(now))
+
+    def try_acquire(self, exclude=()):
+        """바로 사용할 수 있는 가장 건강한 키를 예약 (없으면 None)"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                s for s in self.keys
+                if s.index not in exclude and s.cooldown_until <= now and s.bucket.available(now) >= 1
+            ]
+            if not candidates:
+                return None
+            state = min(candidates, key=lambda s: self._score(s, now))
+            state.bucket.take(now)
+            state.in_flight += 1
+            return state
+
+    def next_ready_in(self, exclude=()) -> float:
+        """사용 가능한 키가 생길 때까지 남은 최소 시간"""
+        with self._lock:
+            now = time.monotonic()
+            waits = [
+                max(s.cooldown_until - now, s.bucket.wait_time(now))
+                for s in self.keys if s.index not in exclude
+            ]
+            return max(0.0, min(waits)) if waits else 0.0
+
+    async def acquire(self, exclude=(), timeout=None):
+        """사용 가능한 키가 생길 때까지 비동기로 대기 후 예약"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self.try_acquire(exclude)
+            if state is not None:
+                return state
+            wait = self.next_ready_in(exclude)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                wait = min(wait, remaining)
+            await asyncio.sleep(max(wait, 0.05))
+
+    def release(self, state):
+        """결과 없이 예약만 해제 (요청이 취소된 경우)"""
+        with self._lock:
+            state.in_flight -= 1
+
+    def report_success(self, state):
+        with self._lock:
+            state.in_flight -= 1
+            state.successes += 1
+            state.consecutive_failures = 0
+            state.rate_limit_strikes = 0
+
+    def report_failure(self, state, error):
+        """실패 기록 (429/할당량 오류면 해당 키만 쿨다운)"""
+        with self._lock:
+            state.in_flight -= 1
+            state.failures += 1
+            state.consecutive_failures += 1
+            if is_rate_limit_error(error):
+                delay = parse_retry_delay(error)
+                if delay is None:
+                    delay = min(self.max_cooldown, self.base_cooldown * (2 ** state.rate_limit_strikes))
+                state.rate_limit_strikes += 1
+                state.cooldown_until = time.monotonic() + delay
+                print(f"⏳ {state.label} 할당량 초과, {delay:.0f}초 쿨다운")
+
+    def stats(self):
+        """키별 상태 요약"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                s.label: {
+                    "tokens": round(s.bucket.available(now), 2),
+                    "cooldown": round(max(0.0, s.cooldown_until - now), 1),
+                    "in_flight": s.in_flight,
+                    "successes": s.successes,
+                    "failures": s.failures,
+                }
+                for s in self.keys
+            }
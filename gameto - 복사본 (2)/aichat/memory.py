@@ -0,0 +1,134 @@
+import threading
+
+
+SUMMARY_PROMPT = """다음은 좀비 아포칼립스 RPG에서 NPC '{npc_name}'와(과) 플레이어가 나눈 대화의 기존 요약과 그 이후의 대화입니다.
+두 내용을 합쳐 {npc_name}이(가) 기억해야 할 핵심(사실, 약속, 관계와 감정의 변화)만 {max_chars}자 이내의 한국어 3~4문장으로 요약하세요.
+요약문만 출력하세요.
+
+[기존 요약]
+{summary}
+
+[이후 대화]
+{lines}
+"""
+
+
+class NPCMemory:
+    """NPC 한 명의 대화 기억: 최근 대화(고정 크기) + 그 이전 대화의 요약"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.recent = []        # 최근 대화 줄 (capacity를 넘으면 오래된 줄부터 pending으로)
+        self.pending = []       # 아직 요약에 반영되지 않은 오래된 줄
+        self.summary = ""
+        self.summarizing = False
+
+
+class ConversationMemory:
+    """NPC별 대화 기억 저장소
+
+    최근 대화는 NPC마다 capacity줄까지만 보관하고, 밀려난 줄이 summarize_batch줄
+    쌓이면 summarizer 코루틴으로 기존 요약과 합친 새 요약을 비동기로 만듭니다.
+    따라서 프롬프트에 들어가는 기억의 크기는 세션 길이와 관계없이 일정합니다.
+
+    summarizer(npc_name, prompt) -> str 은 요약문을 돌려주는 코루틴 함수이고,
+    submit(coro)는 그 코루틴을 이벤트 루프에 넘기는 함수입니다. 요약에 실패하면
+    밀려난 줄을 잘라 붙인 간단한 요약으로 대신합니다.
+    """
+
+    def __init__(self, summarizer=None, submit=None, capacity=10, summarize_batch=4, summary_chars=400):
+        self.summarizer = summarizer
+        self.submit = submit
+        self.capacity = capacity
+        self.summarize_batch = summarize_batch
+        self.summary_chars = summary_chars
+        self._npcs = {}
+        self._lock = threading.Lock()
+
+    def _memory(self, npc_name) -> NPCMemory:
+        memory = self._npcs.get(npc_name)
+        if memory is None:
+            memory = self._npcs[npc_name] = NPCMemory(self.capacity)
+        return memory
+
+    def history(self, npc_name):
+        """NPC의 최근 대화 목록 (같은 리스트 객체를 계속 사용하므로 읽기용으로만 사용)"""
+        with self._lock:
+            return self._memory(npc_name).recent
+
+    def append(self, npc_name, line):
+        """대화 한 줄 추가, 넘친 줄이 충분히 쌓이면 요약 갱신 예약"""
+        if not npc_name:
+            return
+        with self._lock:
+            memory = self._memory(npc_name)
+            memory.recent.append(line)
+            if len(memory.recent) > memory.capacity:
+                overflow = len(memory.recent) - memory.capacity
+                memory.pending.extend(memory.recent[:overflow])
+                del memory.recent[:overflow]
+            start = len(memory.pending) >= self.summarize_batch and not memory.summarizing
+            if start:
+                memory.summarizing = True
+                lines = list(memory.pending)
+                previous = memory.summary
+        if start:
+            self._schedule(npc_name, previous, lines)
+
+    def summary(self, npc_name) -> str:
+        with self._lock:
+            memory = self._npcs.get(npc_name)
+            return memory.summary if memory else ""
+
+    def prompt_lines(self, npc_name, recent_count=5):
+        """프롬프트용 기억: [요약 줄] + 최근 대화 recent_count줄"""
+        with self._lock:
+            memory = self._npcs.get(npc_name)
+            if memory is None:
+                return []
+            lines = [f"[이전 대화 요약] {memory.summary}"] if memory.summary else []
+            return lines + memory.recent[-recent_count:]
+
+    def _schedule(self, npc_name, previous, lines):
+        if self.summarizer is None or self.submit is None:
+            self._apply_summary(npc_name, self._fallback_summary(previous, lines), len(lines))
+            return
+        try:
+            self.submit(self._summarize(npc_name, previous, lines))
+        except Exception as e:
+            print(f"⚠️ 대화 요약 예약 실패 ({npc_name}): {e}")
+            self._apply_summary(npc_name, self._fallback_summary(previous, lines), len(lines))
+
+    async def _summarize(self, npc_name, previous, lines):
+        prompt = SUMMARY_PROMPT.format(
+            npc_name=npc_name, max_chars=self.summary_chars,
+            summary=previous or "(없음)", lines="\n".join(lines),
+        )
+        summary = None
+        try:
+            summary = await self.summarizer(npc_name, prompt)
+        except Exception as e:
+            print(f"⚠️ 대화 요약 생성 실패 ({npc_name}): {e}")
+        if not summary:
+            summary = self._fallback_summary(previous, lines)
+        self._apply_summary(npc_name, summary, len(lines))
+        print(f"🧠 {npc_name} 대화 요약 갱신 ({len(lines)}줄 반영)")
+
+    def _fallback_summary(self, previous, lines):
+        """요약 모델을 쓸 수 없을 때: 기존 요약 뒤에 줄을 붙이고 앞부분을 잘라 길이 유지"""
+        text = " / ".join(part for part in [previous] + list(lines) if part)
+        return text[-self.summary_chars:]
+
+    def _apply_summary(self, npc_name, summary, consumed):
+        with self._lock:
+            memory = self._memory(npc_name)
+            memory.summary = summary.strip()[:self.summary_chars]
+            del memory.pending[:consumed]
+            memory.summarizing = False
+            again = len(memory.pending) >= self.summarize_batch
+            if again:
+                memory.summarizing = True
+                lines = list(memory.pending)
+                previous = memory.summary
+        if again:
+            self._schedule(npc_name, previous, lines)
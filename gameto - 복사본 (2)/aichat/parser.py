@@ -0,0 +1,133 @@
+import json
+import re
+from functools import lru_cache
+
+
+SECTION_LABELS = ("대사", "어투", "속마음", "행동")
+
+# 라벨 -> ParsedResponse 속성 이름 (JSON 응답에서는 영문 키도 허용)
+FIELD_NAMES = {"대사": "speech", "어투": "tone", "속마음": "inner_thought", "행동": "action"}
+
+_LABELS = "|".join(SECTION_LABELS)
+
+# 줄 맨 앞의 섹션 제목: "대사: ...", "## 대사", "**행동** - ...", "\"속마음\": \"...\""
+_SECTION_RE = re.compile(
+    r'(?m)^[ \t#>*\-"]*(' + _LABELS + r')["*]*[ \t]*(?:[:：\-–—>]|(?=\r?$))[ \t*]*'
+)
+# 줄 맨 앞에서 찾지 못했을 때의 마지막 수단: 문장 중간의 "대사:" 형태
+_INLINE_RE = re.compile(r"(" + _LABELS + r")\s*[:：]\s*")
+# ```json ... ``` 블록
+_FENCED_JSON_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+_QUOTED_VALUE_RE = re.compile(r'^"(.*?)"\s*,?\s*$', re.DOTALL)
+
+
+class ParsedResponse:
+    """NPC 응답 한 번을 파싱한 결과"""
+
+    __slots__ = ("speech", "tone", "inner_thought", "action", "final_emotions", "emotion_changes")
+
+    def __init__(self, speech=None, tone=None, inner_thought=None, action=None,
+                 final_emotions=None, emotion_changes=None):
+        self.speech = speech
+        self.tone = tone
+        self.inner_thought = inner_thought
+        self.action = action
+        self.final_emotions = final_emotions
+        self.emotion_changes = emotion_changes
+
+    @property
+    def is_valid(self) -> bool:
+        """대사가 있어야 유효한 응답"""
+        return bool(self.speech)
+
+    def get(self, label):
+        """라벨(대사, 행동 등) 또는 속성 이름으로 값 조회"""
+        return getattr(self, FIELD_NAMES.get(label, label), None)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"ParsedResponse({fields})"
+
+
+def strip_quotes(value: str) -> str:
+    """값 전체를 감싼 따옴표 제거 ('"안녕",' -> '안녕'), 스트리밍 출력에도 같은 규칙 사용"""
+    quoted = _QUOTED_VALUE_RE.match(value)
+    return quoted.group(1).strip() if quoted else value
+
+
+def _clean(value: str):
+    return strip_quotes(value.strip()) or None
+
+
+def _from_dict(data: dict, result: ParsedResponse):
+    for label, name in FIELD_NAMES.items():
+        value = data.get(label, data.get(name))
+        if value is not None and getattr(result, name) is None:
+            setattr(result, name, str(value).strip() or None)
+    if isinstance(data.get("final_emotions"), dict):
+        result.final_emotions = data["final_emotions"]
+    if isinstance(data.get("emotion_changes"), dict):
+        result.emotion_changes = data["emotion_changes"]
+
+
+def _embedded_json(text: str):
+    """응답 안의 JSON 블록(final_emotions 등)을 찾아 (dict, 시작, 끝) 반환"""
+    fenced = _FENCED_JSON_RE.search(text)
+    if fenced:
+        try:
+            data = json.loads(fenced.group(1))
+            if isinstance(data, dict):
+                return data, fenced.start(), fenced.end()
+        except ValueError:
+            pass
+    start = text.find("{")
+    if start >= 0:
+        try:
+            data, end = json.JSONDecoder().raw_decode(text, start)
+            if isinstance(data, dict):
+                return data, start, end
+        except ValueError:
+            pass
+    return None, 0, 0
+
+
+def _parse(text: str) -> ParsedResponse:
+    result = ParsedResponse()
+    if not text:
+        return result
+
+    # 응답 전체가 JSON인 경우
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        try:
+            data = json.loads(stripped)
+            if isinstance(data, dict):
+                _from_dict(data, result)
+                return result
+        except ValueError:
+            pass
+
+    # 감정 JSON 블록이 섞여 있으면 떼어내고 나머지를 섹션 단위로 분리
+    data, start, end = _embedded_json(text)
+    if data is not None:
+        _from_dict(data, result)
+        text = text[:start] + text[end:]
+
+    matches = list(_SECTION_RE.finditer(text)) or list(_INLINE_RE.finditer(text))
+    for i, match in enumerate(matches):
+        name = FIELD_NAMES[match.group(1)]
+        if getattr(result, name) is not None:
+            continue  # 같은 라벨이 다시 나오면 첫 번째 값 사용
+        body_end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        setattr(result, name, _clean(text[match.end():body_end]))
+    return result
+
+
+@lru_cache(maxsize=128)
+def parse_npc_response(text: str) -> ParsedResponse:
+    """NPC 응답을 한 번만 훑어 대사/어투/속마음/행동과 감정 JSON을 모두 추출
+
+    같은 응답을 검증과 UI 갱신에서 반복해 파싱하지 않도록 결과를 캐시합니다.
+    반환된 객체는 공유되므로 수정하지 마세요.
+    """
+    return _parse(text)
@@ -0,0 +1,78 @@
+import hashlib
+import threading
+import time
+
+from aichat.cache import normalize_prompt
+
+
+def prompt_fingerprint(prompt: str) -> str:
+    """프롬프트 상황 비교용 해시 (분 단위 시각 등은 정규화 후 비교)"""
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+
+class PrefetchEntry:
+    def __init__(self, fingerprint, future):
+        self.fingerprint = fingerprint
+        self.future = future
+        self.created = time.monotonic()
+
+
+class PrefetchCache:
+    """NPC별로 미리 시작해 둔 응답 생성(추측 실행)을 잠깐 보관하는 캐시
+
+    start()로 생성을 시작해 두고, 실제 대화가 시작될 때 take()에 같은 프롬프트를
+    넘기면 진행 중이거나 끝난 Future를 돌려받습니다. 상황이 달라졌거나(프롬프트
+    불일치) ttl이 지났거나 cancel()되면 요청을 취소하고 버립니다.
+    """
+
+    def __init__(self, ttl=20.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {"started": 0, "hits": 0, "misses": 0, "cancelled": 0}
+
+    def _alive(self, entry):
+        return (time.monotonic() - entry.created < self.ttl
+                and not entry.future.cancelled()
+                and not (entry.future.done() and entry.future.exception() is not None))
+
+    def matches(self, npc_name, prompt) -> bool:
+        """같은 상황의 추측 실행이 이미 있는지"""
+        with self._lock:
+            entry = self._entries.get(npc_name)
+            return entry is not None and entry.fingerprint == prompt_fingerprint(prompt) and self._alive(entry)
+
+    def start(self, npc_name, prompt, submit):
+        """submit()으로 생성을 시작하고 보관 (이전 추측 실행은 취소)"""
+        fingerprint = prompt_fingerprint(prompt)
+        self.cancel(npc_name)
+        future = submit()
+        with self._lock:
+            self._entries[npc_name] = PrefetchEntry(fingerprint, future)
+            self.stats["started"] += 1
+
+    def take(self, npc_name, prompt):
+        """상황이 같으면 Future를 꺼내 반환, 아니면 취소하고 None"""
+        with self._lock:
+            entry = self._entries.pop(npc_name, None)
+            if entry is None:
+                return None
+            if entry.fingerprint == prompt_fingerprint(prompt) and self._alive(entry):
+                self.stats["hits"] += 1
+                return entry.future
+            self.stats["misses"] += 1
+        entry.future.cancel()
+        return None
+
+    def cancel(self, npc_name):
+        """NPC의 추측 실행 취소 (플레이어가 멀어졌을 때 등)"""
+        with self._lock:
+            entry = self._entries.pop(npc_name, None)
+        if entry is not None and not entry.future.done():
+            entry.future.cancel()
+            with self._lock:
+                self.stats["cancelled"] += 1
+
+    def cancel_all(self):
+        for npc_name in list(self._entries):
+            self.cancel(npc_name)
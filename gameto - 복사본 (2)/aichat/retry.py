@@ -0,0 +1,264 @@
+import asyncio
+import random
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """서킷 브레이커가 열려 있어 요청을 보내지 않음"""
+
+
+class RetryExhaustedError(Exception):
+    """재시도 횟수 또는 턴 마감 시간을 모두 소진함"""
+
+    def __init__(self, message, last_error=None):
+        super().__init__(message)
+        self.last_error = last_error
+
+
+class InvalidResponseError(Exception):
+    """응답은 받았지만 검증(validate)을 통과하지 못함"""
+
+
+class ThrottledError(Exception):
+    """로컬 속도 제한 때문에 이번 시도를 쓰지 못함 (백엔드 장애가 아님)"""
+
+
+class KeyPoolExhausted(ThrottledError):
+    """대기 시간 안에 쓸 수 있는 API 키가 없어 요청을 보내지 않음"""
+
+
+class RateLimitedError(ThrottledError):
+    """키 하나가 429/할당량 초과로 거절됨 (해당 키는 키 풀에서 쿨다운)"""
+
+    status = 429
+
+
+class RetryStats:
+    """재시도 관련 카운터"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            "calls": 0,               # 실행된 작업(턴) 수
+            "attempts": 0,            # 실제 API 호출 수
+            "retries": 0,             # 첫 시도 이후 추가 호출 수
+            "successes": 0,
+            "failures": 0,            # 예외로 끝난 호출 수
+            "invalid_responses": 0,   # 응답은 왔지만 버려진 호출 수
+            "wasted_calls": 0,        # 결과가 쓰이지 않은 호출 수 (failures + invalid_responses)
+            "deadline_exceeded": 0,
+            "exhausted": 0,
+            "breaker_rejections": 0,
+            "throttled": 0,           # 키 부족/429로 백오프한 횟수 (브레이커에 반영하지 않음)
+        }
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+
+class CircuitBreaker:
+    """연속 실패가 쌓이면 일정 시간 요청을 차단하고, 이후 시험 요청 하나로 복구 여부 확인"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.open_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            self._update_state()
+            return self._state
+
+    def _update_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """요청을 보내도 되는지 확인 (HALF_OPEN에서는 시험 요청 하나만 허용)"""
+        with self._lock:
+            self._update_state()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.open_count += 1
+                    print(f"🚫 서킷 브레이커 열림 ({self.reset_timeout:.0f}초 동안 요청 차단)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        """시험 요청이 결과 없이 취소된 경우 다른 요청이 시험할 수 있도록 해제"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._update_state()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "open_count": self.open_count,
+            }
+
+
+class RetryPolicy:
+    """AI 계층의 단일 재시도 정책
+
+    지수 백오프(full jitter), 작업당 마감 시간, 서킷 브레이커를 한곳에서 적용합니다.
+    호출하는 쪽에서는 추가 재시도 루프를 두지 말고 validate로 응답 검증만 넘기면 됩니다.
+
+    브레이커에는 5xx, 시간 초과, 연결 오류(connection_errors)만 실패로 기록합니다.
+    KeyPoolExhausted(요청을 보내지 않음)는 호출 횟수에도 넣지 않고, RateLimitedError(429)는
+    호출로는 세되 낭비된 호출이나 브레이커 실패로는 세지 않고 백오프만 합니다.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0, deadline=25.0,
+                 breaker=None, stats=None, non_retryable_status=(400, 404), connection_errors=()):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = stats or RetryStats()
+        self.non_retryable_status = non_retryable_status
+        self.connection_errors = (asyncio.TimeoutError, ConnectionError) + tuple(connection_errors)
+
+    def backoff(self, attempt: int) -> float:
+        """attempt번째 실패 후 대기 시간 (0 ~ 지수 상한 사이의 무작위 값)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def is_retryable(self, error) -> bool:
+        # 스트리밍 도중 끊긴 경우처럼 호출한 쪽이 retryable=False로 표시한 오류는 재시도하지 않음
+        if getattr(error, "retryable", True) is False:
+            return False
+        return getattr(error, "status", None) not in self.non_retryable_status
+
+    def is_backend_failure(self, error) -> bool:
+        """서킷 브레이커에 실패로 기록할 오류인지 (5xx, 시간 초과, 연결 오류)"""
+        status = getattr(error, "status", None)
+        if isinstance(status, int):
+            return status >= 500
+        return isinstance(error, self.connection_errors)
+
+    async def run(self, attempt_fn, validate=None, deadline=None):
+        """attempt_fn(남은 시간)을 정책에 따라 실행하고 검증된 결과 반환"""
+        self.stats.incr("calls")
+        end = time.monotonic() + (self.deadline if deadline is None else deadline)
+        last_error = None
+        out_of_time = False
+
+        attempt = 0     # 실제로 보낸 API 호출 수
+        throttled = 0   # 키가 없어 호출하지 못한 횟수
+        while attempt < self.max_attempts:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                out_of_time = True
+                break
+            if not self.breaker.allow():
+                self.stats.incr("breaker_rejections")
+                raise CircuitOpenError("AI 백엔드 서킷 브레이커가 열려 있습니다.")
+
+            try:
+                result = await asyncio.wait_for(attempt_fn(remaining), remaining)
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except KeyPoolExhausted as e:
+                # 요청을 보내지 않았으므로 호출/실패로 세지 않고 기다렸다 다시 시도
+                self.breaker.release_probe()
+                self.stats.incr("throttled")
+                last_error = e
+                delay = self.backoff(throttled)
+                throttled += 1
+            except Exception as e:
+                self._count_attempt(attempt)
+                attempt += 1
+                last_error = e
+                if isinstance(e, RateLimitedError):
+                    # 키 하나의 할당량 문제: 백엔드는 정상이므로 브레이커에 반영하지 않음
+                    self.breaker.release_probe()
+                    self.stats.incr("throttled")
+                else:
+                    self.stats.incr("failures")
+                    self.stats.incr("wasted_calls")
+                    if self.is_backend_failure(e):
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.release_probe()
+                    if not self.is_retryable(e):
+                        raise
+                if attempt >= self.max_attempts:
+                    break
+                delay = self.backoff(attempt - 1)
+            else:
+                self._count_attempt(attempt)
+                attempt += 1
+                # 백엔드는 응답했으므로 브레이커 입장에서는 성공
+                self.breaker.record_success()
+                if validate is None or validate(result):
+                    self.stats.incr("successes")
+                    return result
+                self.stats.incr("invalid_responses")
+                self.stats.incr("wasted_calls")
+                last_error = InvalidResponseError("응답이 검증을 통과하지 못했습니다.")
+                if attempt >= self.max_attempts:
+                    break
+                delay = self.backoff(attempt - 1)
+
+            if time.monotonic() + delay >= end:
+                out_of_time = True
+                break
+            if isinstance(last_error, KeyPoolExhausted):
+                print(f"⏳ 쓸 수 있는 API 키 대기 {delay:.2f}초")
+            else:
+                print(f"🔁 재시도 대기 {delay:.2f}초 ({attempt}/{self.max_attempts}): {last_error}")
+            await asyncio.sleep(delay)
+
+        if out_of_time or isinstance(last_error, asyncio.TimeoutError):
+            self.stats.incr("deadline_exceeded")
+        else:
+            self.stats.incr("exhausted")
+        raise RetryExhaustedError("재시도 한도를 모두 사용했습니다.", last_error)
+
+    def _count_attempt(self, attempt):
+        self.stats.incr("attempts")
+        if attempt:
+            self.stats.incr("retries")
+
+    def snapshot(self) -> dict:
+        """카운터와 브레이커 상태 요약"""
+        data = self.stats.snapshot()
+        data["breaker"] = self.breaker.snapshot()
+        return data
@@ -0,0 +1,126 @@
+import json
+
+from aichat.parser import ParsedResponse, parse_npc_response
+
+
+class SchemaValidationError(ValueError):
+    """응답 JSON이 스키마와 맞지 않음"""
+
+    def __init__(self, path, message):
+        super().__init__(f"{path or '$'}: {message}")
+        self.path = path
+
+
+_TYPE_CHECKS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+}
+
+
+def compile_schema(schema: dict, path=""):
+    """Gemini responseSchema(OpenAPI 부분집합)를 검증 함수로 한 번만 컴파일
+
+    반환된 함수는 값이 스키마와 맞지 않으면 SchemaValidationError를 던집니다.
+    """
+    type_name = str(schema.get("type", "")).lower()
+    type_check = _TYPE_CHECKS.get(type_name)
+    nullable = schema.get("nullable", False)
+    enum = frozenset(schema["enum"]) if "enum" in schema else None
+    minimum = schema.get("minimum")
+    maximum = schema.get("maximum")
+    max_items = schema.get("maxItems")
+    required = tuple(schema.get("required", ()))
+    properties = {
+        name: compile_schema(sub, f"{path}.{name}")
+        for name, sub in schema.get("properties", {}).items()
+    }
+    items = compile_schema(schema["items"], f"{path}[]") if "items" in schema else None
+
+    def validate(value):
+        if value is None and nullable:
+            return
+        if type_check and not type_check(value):
+            raise SchemaValidationError(path, f"{type_name} 타입이어야 합니다 (받은 값: {type(value).__name__})")
+        if enum is not None and value not in enum:
+            raise SchemaValidationError(path, f"허용되지 않은 값: {value!r}")
+        if minimum is not None and value < minimum:
+            raise SchemaValidationError(path, f"{minimum} 이상이어야 합니다")
+        if maximum is not None and value > maximum:
+            raise SchemaValidationError(path, f"{maximum} 이하여야 합니다")
+        if type_name == "object":
+            for name in required:
+                if name not in value:
+                    raise SchemaValidationError(path, f"필수 항목 '{name}' 누락")
+            for name, sub in properties.items():
+                if name in value:
+                    sub(value[name])
+        elif type_name == "array":
+            if max_items is not None and len(value) > max_items:
+                raise SchemaValidationError(path, f"항목은 최대 {max_items}개입니다")
+            if items is not None:
+                for item in value:
+                    items(item)
+
+    return validate
+
+
+def build_dialogue_schema(emotion_names) -> dict:
+    """대화 응답용 responseSchema (대사/어투/속마음/행동 + 감정 변화량)"""
+    return {
+        "type": "OBJECT",
+        "properties": {
+            "speech": {"type": "STRING", "description": "대사: NPC가 실제로 말하는 내용"},
+            "tone": {"type": "STRING", "description": "어투: NPC의 말투와 표정 묘사"},
+            "inner_thought": {"type": "STRING", "description": "속마음: NPC의 내면 생각"},
+            "action": {"type": "STRING", "description": "행동: NPC의 구체적인 행동 묘사"},
+            "emotion_changes": {
+                "type": "ARRAY",
+                "maxItems": 20,
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "emotion": {"type": "STRING", "enum": list(emotion_names)},
+                        "delta": {"type": "NUMBER", "minimum": -10, "maximum": 10},
+                        "reason": {"type": "STRING"},
+                    },
+                    "required": ["emotion", "delta"],
+                    "propertyOrdering": ["emotion", "delta", "reason"],
+                },
+            },
+        },
+        "required": ["speech", "action", "inner_thought", "emotion_changes"],
+        "propertyOrdering": ["speech", "tone", "inner_thought", "action", "emotion_changes"],
+    }
+
+
+STRUCTURED_OUTPUT_INSTRUCTION = (
+    "\n\n**[출력 형식]**\n"
+    "위의 '대사/어투/속마음/행동' 텍스트 형식 대신 지정된 JSON 스키마로만 응답하세요. "
+    "speech=대사, tone=어투, inner_thought=속마음, action=행동, "
+    "emotion_changes=이번 대화로 변한 감정과 변화량(-10~10) 및 짧은 이유입니다."
+)
+
+
+def parse_structured_response(text: str, validator) -> ParsedResponse:
+    """스키마 검증을 통과하면 그대로 사용하고, 실패했을 때만 휴리스틱 파서로 대체"""
+    try:
+        data = json.loads(text)
+        validator(data)
+    except (ValueError, TypeError) as e:
+        print(f"⚠️ 구조화 응답 검증 실패, 휴리스틱 파싱으로 대체: {e}")
+        return parse_npc_response(text or "")
+
+    changes = {}
+    for item in data.get("emotion_changes") or []:
+        changes[item["emotion"]] = {"delta": float(item["delta"]), "reason": item.get("reason", "")}
+    return ParsedResponse(
+        speech=(data.get("speech") or "").strip() or None,
+        tone=(data.get("tone") or "").strip() or None,
+        inner_thought=(data.get("inner_thought") or "").strip() or None,
+        action=(data.get("action") or "").strip() or None,
+        emotion_changes=changes,
+    )
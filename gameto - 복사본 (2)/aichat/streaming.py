@@ -0,0 +1,138 @@
+import re
+
+from aichat.parser import SECTION_LABELS, strip_quotes
+
+
+# 줄 맨 앞의 "대사:" / "**행동**:" / "- 속마음 :" 형태의 섹션 제목
+_LABEL_RE = re.compile(r"(?m)^[ \t#>*\-]*(" + "|".join(SECTION_LABELS) + r")[ \t*]*[:：][ \t*]*")
+_LINE_PREFIX_RE = re.compile(r"^[ \t#>*\-]*")
+# 아직 열린 대사 끝의 따옴표는 닫는 따옴표일 수 있으므로 다음 조각이 올 때까지 보류
+_PENDING_CLOSE_QUOTE_RE = re.compile(r'"\s*,?\s*$')
+# 첫 닫는 따옴표 뒤가 이 모양이면 아직 값 전체를 감싸는 따옴표일 수 있음 (공백/쉼표 또는 안쪽 따옴표 구간)
+_WRAPPED_TAIL_RE = re.compile(r'\s*,?\s*$|[^"]*"')
+
+
+def _could_be_label(tail: str) -> bool:
+    """아직 줄이 끝나지 않은 꼬리 텍스트가 다음 섹션 제목의 앞부분일 수 있는지"""
+    candidate = _LINE_PREFIX_RE.sub("", tail).rstrip(" \t*")
+    if not candidate:
+        return True
+    return any(label.startswith(candidate) or candidate == label for label in SECTION_LABELS)
+
+
+class StreamingSectionParser:
+    """스트리밍으로 도착하는 NPC 응답을 섹션 단위로 나누는 파서
+
+    feed()는 이벤트 목록을 반환합니다.
+    - ("delta", "대사", 텍스트): 대사 섹션에 새로 도착한 부분
+    - ("replace", "대사", 전체 텍스트): 이미 보여 준 대사를 지우고 전체 텍스트로 다시 표시
+    - ("section", 라벨, 전체 텍스트): 섹션 하나가 끝났을 때 (다음 제목이 나오거나 finish())
+
+    섹션 값을 감싼 따옴표는 parse_npc_response와 같은 규칙(strip_quotes)으로 제거합니다.
+    대사가 따옴표로 시작하면 여는 따옴표는 보류한 채 나머지를 보여 주다가, 따옴표가 값
+    전체를 감싸지 않는 것으로 드러나면("안녕" 하고 ...) 따옴표를 포함해 replace로 다시
+    보냅니다. 섹션이 닫힐 때도 보여 준 대사가 최종 값과 다르면 replace를 보내므로,
+    스트리밍으로 보여 준 대사는 항상 parse_npc_response의 대사와 같게 끝납니다.
+    """
+
+    def __init__(self, stream_label="대사"):
+        self.stream_label = stream_label
+        self.text = ""
+        self.streamed = ""
+        self.closed = set()
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        return self._scan(final=False)
+
+    def finish(self):
+        """응답이 끝났을 때 호출, 아직 열린 섹션을 닫음"""
+        return self._scan(final=True)
+
+    def _scan(self, final):
+        events = []
+        matches = list(_LABEL_RE.finditer(self.text))
+        for i, match in enumerate(matches):
+            label = match.group(1)
+            is_open = i + 1 == len(matches) and not final
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(self.text)
+            body = self.text[match.end():end]
+
+            if label in self.closed:
+                continue  # 같은 제목이 다시 나오면 첫 번째 섹션만 사용
+
+            if is_open:
+                if label == self.stream_label:
+                    events.extend(self._stream_delta(self._open_view(body)))
+                continue
+
+            value = strip_quotes(body.strip())
+            self.closed.add(label)
+            if label == self.stream_label:
+                events.extend(self._stream_delta(value))
+            events.append(("section", label, value))
+        return events
+
+    @staticmethod
+    def _safe_prefix(body):
+        """다음 섹션 제목일 수도 있는 마지막 미완성 줄을 제외한 부분"""
+        body = body.lstrip()
+        newline = body.rfind("\n")
+        if newline >= 0 and _could_be_label(body[newline + 1:]):
+            body = body[:newline]
+        return body.rstrip("\r\n")
+
+    def _open_view(self, body):
+        """아직 열린 대사 섹션에서 지금 보여 줄 수 있는 부분
+
+        따옴표로 시작하면 값 전체를 감싸는 따옴표로 보고 여는 따옴표는 보류하고,
+        닫는 따옴표일 수 있는 끝부분도 보류합니다. 따옴표 뒤에 다른 글자가 이어지면
+        감싸는 따옴표가 아니므로 원문 그대로 보여 줍니다.
+        """
+        text = self._safe_prefix(body)
+        if not text.startswith('"'):
+            return text
+        inner = text[1:]
+        close = inner.find('"')
+        if close >= 0 and _WRAPPED_TAIL_RE.match(inner, close + 1) is None:
+            return text
+        return _PENDING_CLOSE_QUOTE_RE.sub("", inner.lstrip())
+
+    def _stream_delta(self, text):
+        if text == self.streamed:
+            return []
+        if not text.startswith(self.streamed):
+            # 이미 보여 준 부분이 달라졌으면(보류했던 따옴표 등) 통째로 다시 표시
+            self.streamed = text
+            return [("replace", self.stream_label, text)]
+        delta = text[len(self.streamed):]
+        self.streamed = text
+        return [("delta", self.stream_label, delta)]
+
+
+if __name__ == "__main__":
+    # 회귀 확인: 스트리밍으로 보여 준 대사가 parse_npc_response의 대사와 같아야 함
+    from aichat.parser import parse_npc_response
+
+    samples = [
+        '대사: "안녕, 반가워!"\n행동: "손을 흔든다"',
+        '대사: "안녕" 하고 그가 중얼거렸다.\n행동: 고개를 숙인다',
+        '대사: 그냥 말함\n행동: 웃음',
+        '대사: "따옴표 하나만',
+    ]
+    for sample in samples:
+        for size in (1, 3, 7):
+            parser = StreamingSectionParser()
+            shown = ""
+            events = []
+            for start in range(0, len(sample), size):
+                events += parser.feed(sample[start:start + size])
+            events += parser.finish()
+            for kind, _, text in events:
+                if kind == "delta":
+                    shown += text
+                elif kind == "replace":
+                    shown = text
+            expected = parse_npc_response(sample).speech
+            assert shown == expected, (sample, size, shown, expected)
+    print("✅ 스트리밍 대사 확인 완료")
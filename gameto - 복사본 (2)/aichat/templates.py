@@ -0,0 +1,72 @@
+import os
+import re
+import threading
+
+
+# {필드} 자리표시자 (기존 safe_format과 같은 규칙)
+_FIELD_RE = re.compile(r"\{([^}]+)\}")
+
+
+class CompiledTemplate:
+    """문자열 템플릿을 고정 텍스트/자리표시자 조각으로 한 번만 나눠 둔 것
+
+    render()는 자리표시자만 채워 넣고 한 번의 join으로 결과를 만듭니다.
+    값이 없거나 None인 필드는 빈 문자열로 채워집니다.
+    """
+
+    def __init__(self, source: str, path=None):
+        self.source = source
+        self.path = path
+        self._parts = []   # 고정 텍스트와 자리표시자 자리(None)가 섞인 목록
+        self._slots = []   # (self._parts 안의 위치, 필드 이름)
+        pos = 0
+        for match in _FIELD_RE.finditer(source):
+            self._parts.append(source[pos:match.start()])
+            self._slots.append((len(self._parts), match.group(1)))
+            self._parts.append(None)
+            pos = match.end()
+        self._parts.append(source[pos:])
+
+    @property
+    def fields(self):
+        """템플릿에 등장하는 필드 이름 (중복 제거, 등장 순서)"""
+        return list(dict.fromkeys(name for _, name in self._slots))
+
+    def render(self, data: dict) -> str:
+        parts = self._parts.copy()
+        for index, name in self._slots:
+            value = data.get(name)
+            parts[index] = "" if value is None else str(value)
+        return "".join(parts)
+
+
+class TemplateStore:
+    """템플릿 파일을 컴파일해 캐시하고, 파일 수정 시각이 바뀌었을 때만 다시 컴파일"""
+
+    def __init__(self):
+        self._cache = {}   # 경로 -> (mtime, CompiledTemplate)
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """컴파일된 템플릿 반환 (파일이 없으면 None)"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            with open(path, 'r', encoding='utf-8') as f:
+                template = CompiledTemplate(f.read(), path)
+            self._cache[path] = (mtime, template)
+            print(f"✅ 템플릿 컴파일 완료: {path} (필드 {len(template.fields)}개)")
+            return template
+
+    def render(self, path, data: dict):
+        """템플릿을 채운 문자열 반환 (파일이 없으면 None)"""
+        template = self.get(path)
+        return template.render(data) if template is not None else None
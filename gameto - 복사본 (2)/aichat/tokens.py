@@ -0,0 +1,14 @@
+import math
+
+
+def estimate_tokens(text) -> int:
+    """프롬프트 토큰 수 대략 추정 (API 호출 없이 쓰는 보수적인 근사치)
+
+    영문/숫자/기호는 약 4글자당 1토큰, 한글 등 그 밖의 문자는 약 1.5글자당
+    1토큰으로 계산합니다. 정확한 값이 아니라 예산 관리를 위한 상한 추정입니다.
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ch < "\x80")
+    other_chars = len(text) - ascii_chars
+    return math.ceil(ascii_chars / 4 + other_chars / 1.5)
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+from collections import deque
+
+
+class CancelToken:
+    """NPC 턴 요청 하나의 취소 표시 (대화 상대와 대화 세대(epoch)에 묶임)"""
+
+    def __init__(self, npc_name, epoch):
+        self.npc_name = npc_name
+        self.epoch = epoch
+        self._cancelled = threading.Event()
+        self._task = None
+        self._loop = None
+        self._on_finish = None
+
+    @property
+    def key(self):
+        return self.npc_name, self.epoch
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """취소 표시 후, 이미 실행 중이면 작업도 취소"""
+        self._cancelled.set()
+        task, loop = self._task, self._loop
+        if task is not None and not task.done():
+            loop.call_soon_threadsafe(task.cancel)
+
+
+class TurnExecutor:
+    """NPC 턴 생성을 고정된 수의 작업자로만 실행하는 실행기
+
+    submit()된 요청은 대기열(최대 max_pending개, 넘치면 가장 오래된 요청을 버림)에
+    들어갔다가 작업자 자리가 나면 클라이언트 이벤트 루프에서 실행됩니다.
+    advance()로 대화 세대가 바뀌면 이전 세대의 요청은 실행 전이면 버리고,
+    실행 중이면 취소합니다. 결과를 화면에 반영하기 전에도 token.cancelled를 확인하세요.
+    submit()에 넘긴 on_finish는 요청이 끝나든 버려지든 루프 스레드에서 정확히 한 번 호출됩니다.
+    """
+
+    def __init__(self, loop, workers=2, max_pending=4):
+        self.loop = loop
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pending = deque()     # (token, factory) - 루프 스레드에서만 다룸
+        self._live = set()          # 아직 끝나지 않은 토큰
+        self._active = 0
+        self._current = None        # 현재 대화 세대 (npc, epoch)
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "completed": 0, "dropped": 0, "cancelled": 0}
+
+    def token(self, npc_name, epoch) -> CancelToken:
+        return CancelToken(npc_name, epoch)
+
+    def submit(self, token: CancelToken, factory, on_finish=None):
+        """factory(token) -> 코루틴 을 대기열에 넣음 (어느 스레드에서나 호출 가능)"""
+        token._on_finish = on_finish
+        with self._lock:
+            self._live.add(token)
+            self.stats["submitted"] += 1
+        self.loop.call_soon_threadsafe(self._enqueue, token, factory)
+
+    def advance(self, npc_name, epoch):
+        """대화 세대 변경: 다른 세대의 요청은 모두 취소"""
+        with self._lock:
+            self._current = (npc_name, epoch)
+            stale = [token for token in self._live if token.key != self._current]
+        for token in stale:
+            if not token.cancelled:
+                token.cancel()
+                with self._lock:
+                    self.stats["cancelled"] += 1
+        # 대기 중이던 이전 세대 요청은 작업자 자리를 기다리지 않고 바로 정리
+        self.loop.call_soon_threadsafe(self._purge_cancelled)
+
+    def _purge_cancelled(self):
+        for stale in [item for item in self._pending if item[0].cancelled]:
+            self._pending.remove(stale)
+            self._finish(stale[0], "dropped")
+
+    def _enqueue(self, token, factory):
+        # 이미 취소된 요청을 먼저 정리해야 살아 있는 요청이 밀려나지 않음
+        self._purge_cancelled()
+        self._pending.append((token, factory))
+        while len(self._pending) > self.max_pending:
+            dropped, _ = self._pending.popleft()
+            dropped.cancel()
+            self._finish(dropped, "dropped")
+            print(f"⚠️ 대기 중인 NPC 요청이 너무 많아 가장 오래된 요청을 버렸습니다 ({dropped.npc_name})")
+        self._pump()
+
+    def _pump(self):
+        while self._active < self.workers and self._pending:
+            token, factory = self._pending.popleft()
+            if token.cancelled:
+                self._finish(token, "dropped")  # 실행 전에 버려진 요청은 할당량을 쓰지 않음
+                continue
+            self._active += 1
+            token._loop = self.loop
+            token._task = self.loop.create_task(self._run(token, factory))
+
+    async def _run(self, token, factory):
+        outcome = "completed"
+        try:
+            await factory(token)
+        except asyncio.CancelledError:
+            outcome = "dropped"
+        except Exception as e:
+            print(f"❌ NPC 턴 실행 중 오류: {e}")
+        finally:
+            self._active -= 1
+            self._finish(token, outcome if not token.cancelled else "dropped")
+            self._pump()
+
+    def _finish(self, token, outcome):
+        with self._lock:
+            self._live.discard(token)
+            self.stats[outcome] += 1
+        on_finish, token._on_finish = token._on_finish, None
+        if on_finish is not None:
+            try:
+                on_finish()
+            except Exception as e:
+                print(f"❌ NPC 턴 종료 처리 중 오류: {e}")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.stats, live=len(self._live), active=self._active)
@@ -0,0 +1,131 @@
+import threading
+from collections.abc import Mapping
+
+from aichat.tokens import estimate_tokens
+
+
+# 상세 수준 -> 토큰 예산
+DETAIL_BUDGETS = {
+    "minimal": 150,
+    "standard": 450,
+    "detailed": 1000,
+}
+DEFAULT_DETAIL = "standard"
+
+
+def _join(value, sep=" / "):
+    """리스트/튜플은 구분자로 이어 붙이고 dict는 값만 이어 붙임"""
+    if isinstance(value, Mapping):
+        return sep.join(_join(item, sep) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sep.join(_join(item, sep) for item in value)
+    return str(value)
+
+
+def _top_scores(stats, count):
+    """점수 dict에서 높은 순으로 count개를 "항목 점수" 형태로"""
+    if not isinstance(stats, Mapping):
+        return ""
+    numeric = [(k, v) for k, v in stats.items() if isinstance(v, (int, float))]
+    numeric.sort(key=lambda item: item[1], reverse=True)
+    return ", ".join(f"{k} {v}" for k, v in numeric[:count])
+
+
+def _sections(name, profile):
+    """(최소 상세 수준, 줄) 목록 - 중요한 순서대로"""
+    core = profile.get('core_info', {})
+    persona = core.get('persona', {})
+    speech = persona.get('speech_style', {})
+    background = core.get('background', {})
+    psychology = profile.get('psychology', {})
+    abilities = profile.get('abilities', {})
+
+    lines = [("minimal", f"이름: {name}")]
+    identity = " ".join(str(v) for v in (core.get('grade'), profile.get('affiliation'), core.get('affiliation_detail')) if v)
+    if identity:
+        lines.append(("minimal", f"소속: {identity}"))
+    if persona.get('core_traits'):
+        lines.append(("minimal", f"핵심 성격: {_join(persona['core_traits'], ', ')}"))
+    if isinstance(speech, Mapping) and speech.get('tone'):
+        lines.append(("minimal", f"어조: {speech['tone']}"))
+    elif speech and not isinstance(speech, Mapping):
+        lines.append(("minimal", f"말투: {_join(speech)}"))
+
+    if persona.get('personality_rules'):
+        lines.append(("standard", f"성격: {_join(persona['personality_rules'], ' ')}"))
+    if isinstance(speech, Mapping) and speech.get('characteristics'):
+        lines.append(("standard", f"말투: {_join(speech['characteristics'], ' ')}"))
+    if isinstance(background, Mapping) and background.get('history'):
+        lines.append(("standard", f"배경: {background['history']}"))
+
+    if isinstance(background, Mapping) and background.get('significant_events_highschool'):
+        lines.append(("detailed", f"주요 사건: {_join(background['significant_events_highschool'])}"))
+    mental = _top_scores(psychology.get('mental_health'), 4)
+    if mental:
+        lines.append(("detailed", f"심리 상태: {mental}"))
+    social = _top_scores(psychology.get('social'), 3)
+    if social:
+        lines.append(("detailed", f"사회성: {social}"))
+    unique = _top_scores(abilities.get('unique'), 3)
+    if unique:
+        lines.append(("detailed", f"능력: {unique}"))
+    return lines
+
+
+def render_context_pack(name, profile, detail=DEFAULT_DETAIL, budget=None):
+    """프로필을 상세 수준에 맞게 압축한 NPC 정보 문단 (토큰 예산을 넘는 줄은 제외)"""
+    levels = list(DETAIL_BUDGETS)
+    limit = levels.index(detail)
+    budget = budget if budget is not None else DETAIL_BUDGETS[detail]
+    used = 0
+    out = []
+    for level, line in _sections(name, profile):
+        if levels.index(level) > limit:
+            continue
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            continue  # 중요한 줄이 앞에 있으므로 넘치는 줄만 건너뜀
+        out.append(line)
+        used += cost
+    return "\n".join(out) + "\n"
+
+
+class ContextPackStore:
+    """NPC별 컨텍스트 팩(상세 수준별로 미리 렌더링한 프로필 문단) 캐시
+
+    프로필 저장소가 돌려주는 프로필 객체가 바뀌면(파일 수정으로 다시 로드되면)
+    해당 NPC의 팩을 다시 만듭니다.
+    """
+
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self._packs = {}   # 이름 -> (프로필 객체, {상세 수준: 문단})
+        self._lock = threading.Lock()
+
+    def build_all(self):
+        """로드된 모든 NPC의 팩을 미리 생성"""
+        for name in self.profiles.names():
+            self.get(name)
+        print(f"✅ 컨텍스트 팩 {len(self._packs)}개 생성 완료")
+
+    def get(self, npc_name, detail=DEFAULT_DETAIL):
+        """캐시된 NPC 정보 문단 (프로필이 없으면 이름만)"""
+        profile = self.profiles.get(npc_name)
+        if profile is None:
+            return f"이름: {npc_name}\n"
+        cached = self._packs.get(npc_name)
+        if cached is None or cached[0] is not profile:
+            packs = {level: render_context_pack(npc_name, profile, level) for level in DETAIL_BUDGETS}
+            with self._lock:
+                self._packs[npc_name] = cached = (profile, packs)
+        return cached[1].get(detail) or cached[1][DEFAULT_DETAIL]
+
+    def variants(self, npc_name, detail=DEFAULT_DETAIL):
+        """detail부터 점점 짧아지는 문단 목록 (프롬프트 예산 맞추기용)"""
+        levels = list(DETAIL_BUDGETS)
+        start = levels.index(detail) if detail in levels else levels.index(DEFAULT_DETAIL)
+        return [self.get(npc_name, level) for level in reversed(levels[:start + 1])]
+
+    def sizes(self, npc_name):
+        """상세 수준별 추정 토큰 수 (디버그/튜닝용)"""
+        return {level: estimate_tokens(self.get(npc_name, level)) for level in DETAIL_BUDGETS}
@@ -0,0 +1,139 @@
+from collections import deque
+
+
+# 감정 키워드 매핑
+EMOTION_KEYWORDS = {
+    'trust': ['신뢰', '믿음', '의지'],
+    'intimacy': ['친밀', '가까움', '친근'],
+    'respect': ['존경', '존중', '인정'],
+    'bond': ['유대', '연결', '공감'],
+    'cooperation': ['협력', '협동', '도움'],
+    'rivalry': ['경쟁', '대립', '견제'],
+    'fellowship': ['동료애', '우정', '친구'],
+    'mentoring': ['가르침', '지도', '조언'],
+    'hostility': ['적대', '미움', '반감'],
+    'betrayal': ['배신', '실망', '배반'],
+    'resentment': ['분노', '화남', '격분'],
+    'distrust': ['불신', '의심', '불안'],
+    'envy': ['질투', '시기', '부러움'],
+    'guilt': ['죄책감', '후회', '미안'],
+    'admiration': ['감탄', '존경', '동경'],
+    'loyalty': ['충성', '헌신', '충실'],
+    'fear': ['두려움', '공포', '무서움'],
+    'avoidance': ['회피', '도망', '기피'],
+    'rejection': ['거절', '거부', '외면'],
+    'curiosity': ['호기심', '궁금', '관심'],
+    'confusion': ['혼란', '혼돈', '당황'],
+    'annoyance': ['짜증', '불만', '성가심'],
+    'wariness': ['경계', '조심', '주의'],
+    'bewilderment': ['당황', '혼란', '놀람']
+}
+
+# 긍정/부정 맥락 단서와 강조 표현
+POSITIVE_CUES = ['좋아', '긍정', '기쁘', '행복', '만족', '즐거움', '감사']
+NEGATIVE_CUES = ['나쁘', '부정', '슬프', '화나', '실망', '불만', '싫어']
+INTENSIFIERS = ['매우', '정말', '너무', '굉장히']
+
+
+class AhoCorasick:
+    """여러 패턴을 텍스트 한 번 훑기로 모두 찾는 Aho-Corasick 매처"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for pattern_id, pattern in enumerate(self.patterns):
+            self._insert(pattern, pattern_id)
+        self._build_links()
+
+    def _insert(self, pattern, pattern_id):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(pattern_id)
+
+    def _build_links(self):
+        # 루트의 자식은 실패 링크가 루트, 나머지는 너비 우선으로 계산
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                # 실패 링크 쪽 출력도 미리 합쳐 두어 탐색 중에는 따라가지 않아도 됨
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def finditer(self, text):
+        """(시작 위치, 패턴 번호)를 등장 순서대로 yield (겹치는 매칭 포함)"""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pattern_id in out[node]:
+                yield pos - len(patterns[pattern_id]) + 1, pattern_id
+
+
+class LexiconHits:
+    """텍스트 한 번 훑기의 결과"""
+
+    def __init__(self):
+        self.emotion_hits = {}   # 감정 -> [(키워드, 위치), ...]
+        self.positive = []       # 긍정 단서 위치
+        self.negative = []       # 부정 단서 위치
+        self.intensifiers = []   # 강조 표현 위치
+
+    def keywords_for(self, emotion):
+        """해당 감정에서 등장한 서로 다른 키워드 목록"""
+        seen = []
+        for keyword, _ in self.emotion_hits.get(emotion, []):
+            if keyword not in seen:
+                seen.append(keyword)
+        return seen
+
+
+class EmotionLexicon:
+    """감정 키워드·맥락 단서·강조 표현을 하나의 매처로 컴파일한 사전"""
+
+    def __init__(self, emotion_keywords=None, positive=None, negative=None, intensifiers=None):
+        self.emotion_keywords = emotion_keywords or EMOTION_KEYWORDS
+        # 패턴 문자열 -> [(분류, 감정)] (같은 키워드가 여러 감정에 속할 수 있음)
+        payloads = {}
+        for emotion, keywords in self.emotion_keywords.items():
+            for keyword in keywords:
+                payloads.setdefault(keyword, []).append(("emotion", emotion))
+        for kind, words in (("positive", positive or POSITIVE_CUES),
+                            ("negative", negative or NEGATIVE_CUES),
+                            ("intensifier", intensifiers or INTENSIFIERS)):
+            for word in words:
+                payloads.setdefault(word, []).append((kind, None))
+        self._payloads = list(payloads.values())
+        self._matcher = AhoCorasick(payloads.keys())
+
+    def scan(self, text: str) -> LexiconHits:
+        """감정 키워드, 맥락 단서, 강조 표현을 한 번에 찾아 위치와 함께 반환"""
+        hits = LexiconHits()
+        patterns = self._matcher.patterns
+        for pos, pattern_id in self._matcher.finditer(text.lower()):
+            for kind, emotion in self._payloads[pattern_id]:
+                if kind == "emotion":
+                    hits.emotion_hits.setdefault(emotion, []).append((patterns[pattern_id], pos))
+                elif kind == "positive":
+                    hits.positive.append(pos)
+                elif kind == "negative":
+                    hits.negative.append(pos)
+                else:
+                    hits.intensifiers.append(pos)
+        return hits
@@ -0,0 +1,167 @@
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+
+# 모든 NPC가 공유하는 감정 이름 -> 열 번호 표
+EMOTION_NAMES = (
+    "trust", "intimacy", "respect", "bond", "cooperation", "rivalry", "fellowship", "mentoring",
+    "hostility", "betrayal", "resentment", "distrust", "envy", "guilt", "admiration", "loyalty",
+    "authority", "leadership", "love", "romantic", "passion", "possessiveness", "protective",
+    "dependency", "responsibility", "devotion", "fear", "avoidance", "rejection", "inferiority",
+    "intimidation", "superiority", "familiarity", "curiosity", "confusion", "annoyance",
+    "awkwardness", "discomfort", "wariness", "bewilderment",
+)
+EMOTION_INDEX = {name: i for i, name in enumerate(EMOTION_NAMES)}
+
+
+def _to_display(value):
+    """float32 값을 dict 보기용 숫자로 변환 (정수면 int, 아니면 소수 첫째 자리)"""
+    value = round(float(value), 1)
+    return int(value) if value.is_integer() else value
+
+
+class EmotionStore:
+    """NPC 감정 상태의 메모리 저장소 (변경분은 백그라운드에서 모아서 파일에 기록)
+
+    감정 값은 NPC마다 float32 행 하나로 NumPy 행렬에 저장되고 열 순서는
+    EMOTION_INDEX를 따릅니다. 값이 없는 감정은 NaN입니다. dict 형태는
+    get()/load() 같은 UI·직렬화 경계에서만 만들어집니다.
+
+    get/set은 메모리만 다루므로 UI 스레드에서 디스크 I/O가 일어나지 않습니다.
+    변경된 항목은 dirty로 표시되었다가 flush_interval마다, 그리고 close() 시에
+    emotion/emotion{번호}.txt 파일로 한꺼번에 저장됩니다.
+    """
+
+    def __init__(self, emotion_dir="emotion", flush_interval=2.0, initial_capacity=8):
+        self.emotion_dir = emotion_dir
+        self.flush_interval = flush_interval
+        self.matrix = np.full((initial_capacity, len(EMOTION_NAMES)), np.nan, dtype=np.float32)
+        self._rows = {}        # npc 번호 -> 행 번호
+        self._extras = {}      # npc 번호 -> 표에 없는 항목 (원래 값 그대로 보존)
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._run_writer, name="emotion-writer", daemon=True)
+        self._writer.start()
+
+    def path_for(self, npc_number) -> str:
+        return os.path.join(self.emotion_dir, f"emotion{npc_number}.txt")
+
+    def _row_for(self, npc_number) -> int:
+        row = self._rows.get(npc_number)
+        if row is None:
+            row = len(self._rows)
+            if row >= self.matrix.shape[0]:
+                grown = np.full((self.matrix.shape[0] * 2, self.matrix.shape[1]), np.nan, dtype=np.float32)
+                grown[:self.matrix.shape[0]] = self.matrix
+                self.matrix = grown
+            self._rows[npc_number] = row
+        return row
+
+    def _write_row(self, npc_number, emotions):
+        row = self._row_for(npc_number)
+        vector = np.full(len(EMOTION_NAMES), np.nan, dtype=np.float32)
+        extras = {}
+        for name, value in emotions.items():
+            index = EMOTION_INDEX.get(name)
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                number = math.nan
+            if index is None or math.isnan(number):
+                extras[name] = value
+            else:
+                vector[index] = number
+        self.matrix[row] = vector
+        self._extras[npc_number] = extras
+
+    def _read_row(self, npc_number):
+        row = self.matrix[self._rows[npc_number]]
+        emotions = {
+            EMOTION_NAMES[i]: _to_display(row[i])
+            for i in np.flatnonzero(~np.isnan(row))
+        }
+        emotions.update(self._extras.get(npc_number, {}))
+        return emotions
+
+    def load(self, npc_number):
+        """파일에서 한 번만 읽어 메모리에 올림 (이미 있으면 메모리 값 사용)"""
+        with self._lock:
+            if npc_number in self._rows:
+                return self._read_row(npc_number)
+        with open(self.path_for(npc_number), 'r', encoding='utf-8') as f:
+            emotions = json.load(f)
+        with self._lock:
+            # 읽는 사이에 다른 스레드가 값을 넣었으면 그 값을 우선
+            if npc_number not in self._rows:
+                self._write_row(npc_number, emotions)
+            return self._read_row(npc_number)
+
+    def get(self, npc_number):
+        """감정 상태의 dict 보기 (없으면 None)"""
+        with self._lock:
+            if npc_number not in self._rows:
+                return None
+            return self._read_row(npc_number)
+
+    def set(self, npc_number, emotions):
+        """dict로 받은 감정 상태로 교체 후 dirty로 표시"""
+        with self._lock:
+            self._write_row(npc_number, emotions)
+            self._dirty.add(npc_number)
+
+    def get_vector(self, npc_number):
+        """감정 상태의 float32 벡터 복사본 (열 순서는 EMOTION_INDEX, 없는 값은 NaN)"""
+        with self._lock:
+            if npc_number not in self._rows:
+                return None
+            return self.matrix[self._rows[npc_number]].copy()
+
+    def set_vector(self, npc_number, vector):
+        """float32 벡터로 감정 상태 교체 (표에 없는 항목은 유지)"""
+        with self._lock:
+            row = self._row_for(npc_number)
+            self.matrix[row] = np.asarray(vector, dtype=np.float32)
+            self._dirty.add(npc_number)
+
+    def population(self):
+        """(npc 번호 목록, 전체 NPC 감정 행렬 복사본) - 전체 대상 벡터 연산용"""
+        with self._lock:
+            numbers = sorted(self._rows, key=self._rows.get)
+            return numbers, self.matrix[:len(numbers)].copy()
+
+    def flush(self):
+        """dirty 항목을 파일에 기록"""
+        with self._flush_lock:
+            with self._lock:
+                pending = {n: self._read_row(n) for n in self._dirty}
+                self._dirty.clear()
+            for npc_number, emotions in pending.items():
+                path = self.path_for(npc_number)
+                try:
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    tmp_path = path + ".tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(emotions, f, ensure_ascii=False, indent=2)
+                    os.replace(tmp_path, path)
+                except Exception as e:
+                    print(f"❌ 감정 상태 파일 저장 중 오류 발생: {path}: {e}")
+                    with self._lock:
+                        self._dirty.add(npc_number)  # 다음 주기에 다시 시도
+            if pending:
+                print(f"💾 감정 상태 {len(pending)}건 파일에 저장")
+
+    def _run_writer(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """백그라운드 저장 중지 후 남은 변경분 저장"""
+        self._stop.set()
+        self._writer.join(timeout=self.flush_interval + 1)
+        self.flush()
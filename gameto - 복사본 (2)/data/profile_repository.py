@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from data.student_registry import STUDENT_REGISTRY
+
+
+def _deep_merge(base, override):
+    """override 값을 base 위에 덮어쓴 새 dict (하위 dict는 재귀적으로 병합)"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _freeze(value):
+    """dict/list를 읽기 전용 구조(MappingProxyType/tuple)로 변환"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """_freeze로 만든 읽기 전용 구조를 수정 가능한 dict/list 복사본으로 변환"""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+class ProfileRepository:
+    """학생 프로필(data/student_*.json) 저장소
+
+    프로필의 "_extends" 템플릿(data/profile_templates/*.json)을 한 번만 병합하고
+    검증한 뒤 읽기 전용으로 캐시합니다. 대화 중의 조회는 dict 조회로 끝나며,
+    프로필이나 템플릿 파일의 수정 시각이 바뀌면 해당 프로필만 다시 만듭니다.
+    수정 시각 확인은 check_interval초에 한 번만 합니다.
+    """
+
+    def __init__(self, data_dir="data", template_dir=None, validator=None, registry=None,
+                 check_interval=2.0):
+        self.data_dir = data_dir
+        self.template_dir = template_dir or os.path.join(data_dir, "profile_templates")
+        self.validator = validator
+        self.registry = registry or STUDENT_REGISTRY
+        self.check_interval = check_interval
+        self._profiles = {}      # 번호(str) -> 병합된 읽기 전용 프로필
+        self._by_name = {}       # 이름 -> 번호(str)
+        self._sources = {}       # 번호(str) -> ((경로, mtime), ...)
+        self._templates = {}     # 템플릿 이름 -> (mtime, dict)
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def load_all(self):
+        """등록된 모든 프로필을 로드 (이름 -> 프로필 dict 반환)"""
+        with self._lock:
+            for number in self.registry:
+                self._load(str(number))
+            self._last_check = time.monotonic()
+            return {name: self._profiles[number] for name, number in self._by_name.items()}
+
+    def get(self, npc_name):
+        """이름으로 프로필 조회 (없으면 None)"""
+        number = self._by_name.get(npc_name)
+        return self.get_by_number(number) if number else None
+
+    def number_of(self, npc_name):
+        """이름에 해당하는 프로필 번호 문자열 (없으면 None)"""
+        self._refresh_if_due()
+        return self._by_name.get(npc_name)
+
+    def get_by_number(self, npc_number):
+        """번호로 프로필 조회 (없으면 None)"""
+        self._refresh_if_due()
+        return self._profiles.get(str(npc_number))
+
+    def names(self):
+        """로드된 프로필의 이름 목록 (번호 순서)"""
+        return sorted(self._by_name, key=lambda name: int(self._by_name[name]))
+
+    def _refresh_if_due(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            self._last_check = now
+            for number, sources in list(self._sources.items()):
+                if any(self._mtime(path) != mtime for path, mtime in sources):
+                    print(f"🔄 프로필 파일 변경 감지, 다시 로드: student_{number}.json")
+                    self._load(number)
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _load(self, number):
+        entry = self.registry.get(int(number)) or {"file": f"student_{number}.json"}
+        path = os.path.join(self.data_dir, entry["file"])
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            sources = [(path, self._mtime(path))]
+            merged = self._resolve(raw, sources, set())
+            if self.validator is not None:
+                merged = self.validator(merged)
+            if not merged:
+                raise ValueError("프로필 검증 실패")
+        except Exception as e:
+            print(f"⚠️ Error loading NPC data for {entry['file']}: {e}")
+            return
+
+        old_name = next((n for n, num in self._by_name.items() if num == number), None)
+        if old_name and old_name != merged['name']:
+            del self._by_name[old_name]
+        self._profiles[number] = _freeze(merged)
+        self._by_name[merged['name']] = number
+        self._sources[number] = tuple(sources)
+
+    def _resolve(self, profile, sources, seen):
+        """_extends에 나열된 템플릿을 순서대로 깔고 그 위에 프로필을 덮어씀"""
+        merged = {}
+        for template_name in profile.get("_extends", ()):
+            if template_name in seen:
+                raise ValueError(f"순환 _extends: {template_name}")
+            template = self._template(template_name, sources)
+            if template is None:
+                continue
+            merged = _deep_merge(merged, self._resolve(template, sources, seen | {template_name}))
+        own = {key: value for key, value in profile.items() if key != "_extends"}
+        return _deep_merge(merged, own)
+
+    def _template(self, name, sources):
+        path = os.path.join(self.template_dir, f"{name}.json")
+        mtime = self._mtime(path)
+        sources.append((path, mtime))
+        if mtime is None:
+            print(f"⚠️ 프로필 템플릿을 찾을 수 없습니다: {path}")
+            return None
+        cached = self._templates.get(name)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'r', encoding='utf-8') as f:
+                cached = (mtime, json.load(f))
+            self._templates[name] = cached
+        return cached[1]
@@ -1,4 +1,3 @@
-import google.generativeai as genai
 import json
 import tkinter as tk
 from tkinter import messagebox
@@ -10,14 +9,39 @@ import datetime
 import random
 import time
 import numpy as np
-import re
 from aichat.manager import AIManager
 from data.student_registry import STUDENT_REGISTRY
+from data.emotion_store import EmotionStore, EMOTION_NAMES, EMOTION_INDEX
+from data.emotion_lexicon import EmotionLexicon
+from data.profile_repository import ProfileRepository, thaw
+from data.context_packs import ContextPackStore
+from maps.renderer import MapRenderer
+from maps.walkability import WalkGrid
+from maps.spatial import SpatialHash
+from maps.pathfinding import NavGrid
+from maps.wander import NPCWanderer
+from maps.placement import NPCPlacer
 import openai
 from typing import Dict, List, Tuple
 import pygame
-import threading
 import traceback
+import asyncio
+from aichat.client import AsyncGeminiClient, build_text_request, extract_text, extract_image, extract_usage, CONNECTION_ERRORS
+from aichat.keypool import KeyPool, is_rate_limit_error
+from aichat.retry import RetryPolicy, CircuitOpenError, RetryExhaustedError, KeyPoolExhausted, RateLimitedError
+from aichat.cache import ResponseCache
+from aichat.image_cache import ImageCache
+from aichat.streaming import StreamingSectionParser
+from aichat.parser import parse_npc_response
+from aichat.templates import TemplateStore
+from aichat.budget import PromptBudgeter, PromptMetrics, PromptSection, emotion_variants, history_variants
+from aichat.tokens import estimate_tokens
+from aichat.memory import ConversationMemory
+from aichat.retrieval import ConversationIndex
+from aichat.prefetch import PrefetchCache
+from aichat.turns import TurnExecutor
+from aichat.coalesce import InputCoalescer
+from aichat.schema import build_dialogue_schema, compile_schema, parse_structured_response, STRUCTURED_OUTPUT_INSTRUCTION
 
 
 # 이미지 경로 상수
@@ -37,10 +61,36 @@ PLAYER_IMAGE = os.path.join(IMAGE_DIR, "player.png")  # 플레이어 이미지 (
 # 1. AI 모델 관리 클래스
 # ------------------------------
 class AIModelManager:
-    def __init__(self):
+    TEXT_MODEL = 'gemini-2.0-pro-exp-02-05'
+    IMAGE_MODEL = 'gemini-2.0-flash-exp'  # 이미지 출력(responseModalities)을 지원하는 모델
+    # 텍스트 생성에 끝내 실패했을 때 반환하는 문구
+    FAILURE_TEXT = "NPC가 응답할 수 없습니다."
+    # 모델별 프롬프트 토큰 예산 (넘으면 우선순위가 낮은 구역부터 줄임)
+    PROMPT_BUDGETS = {
+        TEXT_MODEL: 6000,
+        IMAGE_MODEL: 2000,
+    }
+
+    def __init__(self, async_mode=True, max_in_flight=8, requests_per_minute=15, key_wait_timeout=30,
+                 turn_deadline=25.0, cache_ttl=600.0, cache_path=os.path.join("cache", "responses.sqlite3"),
+                 metrics_path=os.path.join("cache", "prompt_metrics.jsonl"),
+                 image_cache_dir=os.path.join("cache", "images"), image_cache_bytes=200 * 1024 * 1024):
         self.api_keys = self.load_api_keys()
-        self.current_key_index = 0
-        self.configure_models()
+        # 모든 키에 요청을 동시에 분산 (키별 토큰 버킷 + 429 쿨다운)
+        self.key_pool = KeyPool(self.api_keys, requests_per_minute=requests_per_minute)
+        self.key_wait_timeout = key_wait_timeout
+        # 재시도는 이 정책 한곳에서만 (지수 백오프 + 지터, 턴 마감 시간, 서킷 브레이커)
+        self.retry_policy = RetryPolicy(deadline=turn_deadline, connection_errors=CONNECTION_ERRORS)
+        # 정규화된 프롬프트 기준 응답 캐시 (cache_path=None이면 메모리만 사용)
+        self.response_cache = ResponseCache(ttl=cache_ttl, disk_path=cache_path)
+        # 생성 이미지는 (모델, 프롬프트, 파라미터) 해시로 디스크에 보관
+        self.image_cache = ImageCache(image_cache_dir, max_bytes=image_cache_bytes)
+        # 턴별 프롬프트/응답 크기와 지연 시간 기록 (metrics_path=None이면 메모리만)
+        self.prompt_metrics = PromptMetrics(log_path=metrics_path)
+        # 이벤트 루프 스레드 하나 + 커넥션 풀 + 동시 요청 수 제한
+        # async_mode가 False면 NPC 턴을 스레드에서 동기 호출로 처리
+        self.async_mode = async_mode
+        self.client = AsyncGeminiClient(max_in_flight=max_in_flight)
 
     def load_api_keys(self):
         keys = []
@@ -54,63 +104,219 @@ class AIModelManager:
             raise ValueError("API 키 파일을 확인해 주세요 (API_1.txt, API_2.txt)")
         return keys
 
-    def configure_models(self):
-        genai.configure(api_key=self.api_keys[self.current_key_index])
-        self.text_model = genai.GenerativeModel('gemini-2.0-pro-exp-02-05') # 모델 변경
-        self.vision_model = genai.GenerativeModel('gemini-1.5-flash') # 이미지 모델 유지 (필요시 변경)
+    def generate_text(self, prompt: str, validate=None, deadline=None, generation_config=None, usage=None) -> str:
+        """동기 텍스트 생성 (이벤트 루프 스레드에서는 호출하지 말 것)"""
+        return self.client.run(self.generate_text_async(
+            prompt, validate=validate, deadline=deadline, generation_config=generation_config, usage=usage
+        ))
+
+    def generate_text_stream(self, prompt: str, on_chunk, on_start=None, validate=None, deadline=None,
+                             usage=None) -> str:
+        """동기 스트리밍 텍스트 생성 (콜백은 이벤트 루프 스레드에서 호출됨)"""
+        return self.client.run(self.stream_text_async(
+            prompt, on_chunk, on_start=on_start, validate=validate, deadline=deadline, usage=usage
+        ))
 
-    def generate_text(self, prompt: str, retry_count=0) -> str:
+    def prompt_budget(self, model=None) -> int:
+        """모델의 프롬프트 토큰 예산"""
+        return self.PROMPT_BUDGETS.get(model or self.TEXT_MODEL, self.PROMPT_BUDGETS[self.TEXT_MODEL])
+
+    def generate_image(self, prompt: str) -> bytes:
+        """동기 이미지 생성 (이벤트 루프 스레드에서는 호출하지 말 것)"""
+        return self.client.run(self.generate_image_async(prompt))
+
+    async def _request_once(self, model: str, body: dict, tried: set, remaining: float, on_chunk=None) -> dict:
+        """가장 건강한 키로 한 번만 요청 (재시도는 retry_policy가 담당)
+
+        on_chunk를 넘기면 스트리밍으로 요청하고 텍스트 조각이 도착할 때마다 호출합니다.
+        """
+        if len(tried) >= len(self.key_pool):
+            tried.clear()  # 모든 키를 한 번씩 써봤으면 다시 전체에서 선택
+        # 턴 마감보다 조금 먼저 포기해야 대기 시간 초과가 백엔드 시간 초과로 잡히지 않음
+        key = await self.key_pool.acquire(exclude=tried, timeout=min(remaining - 0.1, self.key_wait_timeout))
+        if key is None:
+            raise KeyPoolExhausted("사용 가능한 API 키가 없습니다.")
+        try:
+            print(f"🔄 API 요청 시도 ({key.label}, 진행 중 {self.client.in_flight}건)")
+            if on_chunk is None:
+                data = await self.client.generate_content(model, key.api_key, body)
+            else:
+                data = await self._consume_stream(model, key.api_key, body, on_chunk)
+        except asyncio.CancelledError:
+            self.key_pool.release(key)
+            raise
+        except Exception as e:
+            print(f"⚠️ API 오류 발생 ({key.label}): {e}")
+            self.key_pool.report_failure(key, e)
+            tried.add(key.index)
+            if is_rate_limit_error(e) and getattr(e, "retryable", True):
+                raise RateLimitedError(str(e)) from e
+            raise
+        self.key_pool.report_success(key)
+        print(f"✅ API 응답 성공 ({key.label})")
+        return data
+
+    async def _consume_stream(self, model: str, api_key: str, body: dict, on_chunk) -> dict:
+        """스트리밍 응답을 on_chunk로 흘려보내고 전체 응답을 generateContent 형식으로 반환"""
+        texts = []
+        usage = {}
+        try:
+            async for data in self.client.stream_generate_content(model, api_key, body):
+                usage = extract_usage(data) or usage  # 사용량은 마지막 조각에 담겨 옴
+                chunk = extract_text(data)
+                if chunk:
+                    texts.append(chunk)
+                    on_chunk(chunk)
+        except Exception as e:
+            if texts:
+                # 이미 화면에 나간 조각이 있으면 다른 키로 이어서 받을 수 없으므로 재시도하지 않음
+                e.retryable = False
+            raise
+        return {"candidates": [{"content": {"parts": [{"text": "".join(texts)}]}}], "usageMetadata": usage}
+
+    async def generate_text_async(self, prompt: str, validate=None, deadline=None, generation_config=None,
+                                  usage=None) -> str:
+        """텍스트 생성 코루틴
+
+        재시도는 retry_policy 한곳에서만 처리합니다. validate를 넘기면 검증에 실패한
+        응답도 같은 예산 안에서 재시도되므로 호출하는 쪽에서 다시 반복하지 마세요.
+        generation_config로 responseSchema 등을 넘기면 구조화된 JSON 응답을 받습니다.
+        usage에 dict를 넘기면 마지막 API 응답의 usageMetadata가 채워집니다.
+        """
         if not prompt:
             print("텍스트 생성 오류: 프롬프트가 비어 있습니다.")
-            return "NPC가 응답할 수 없습니다."
+            return self.FAILURE_TEXT
+        config_key = json.dumps(generation_config, sort_keys=True, ensure_ascii=False) if generation_config else ""
+        cache_key = self.response_cache.make_key(self.TEXT_MODEL, prompt, config_key)
+        cached = await self.response_cache.get_async(cache_key)
+        if cached is not None and (validate is None or validate(cached)):
+            print("⚡ 캐시된 응답 사용")
+            return cached
+
+        body = build_text_request(prompt, generation_config)
+        tried = set()
+
+        async def attempt(remaining):
+            data = await self._request_once(self.TEXT_MODEL, body, tried, remaining)
+            if usage is not None:
+                usage.update(extract_usage(data))
+            text = extract_text(data)
+            if not text:
+                raise Exception("응답에 텍스트가 없습니다.")
+            return text
+
         try:
-            print(f"🔄 API 요청 시도 (키 #{self.current_key_index + 1})")
-            response = self.text_model.generate_content(prompt)
-            if response.text:
-                print(f"✅ API 응답 성공 (키 #{self.current_key_index + 1})")
-                return response.text
-            else:
+            text = await self.retry_policy.run(attempt, validate=validate, deadline=deadline)
+            self.response_cache.put(cache_key, text)
+            return text
+        except CircuitOpenError as e:
+            print(f"🚫 {e}")
+        except RetryExhaustedError as e:
+            print(f"❌ 텍스트 생성 실패: {e} (마지막 오류: {e.last_error})")
+        except Exception as e:
+            print(f"❌ 텍스트 생성 실패: {e}")
+        print(f"📊 재시도 통계: {self.retry_stats()}")
+        return self.FAILURE_TEXT
+
+    async def stream_text_async(self, prompt: str, on_chunk, on_start=None, validate=None, deadline=None,
+                                usage=None) -> str:
+        """텍스트를 스트리밍으로 생성하며 조각마다 on_chunk 호출, 전체 텍스트 반환
+
+        on_start는 각 시도가 시작될 때 호출되므로 재시도 시 이전 출력을 지우는 데 사용합니다.
+        """
+        if not prompt:
+            print("텍스트 생성 오류: 프롬프트가 비어 있습니다.")
+            return self.FAILURE_TEXT
+        cache_key = self.response_cache.make_key(self.TEXT_MODEL, prompt)
+        cached = await self.response_cache.get_async(cache_key)
+        if cached is not None and (validate is None or validate(cached)):
+            print("⚡ 캐시된 응답 사용")
+            if on_start:
+                on_start()
+            on_chunk(cached)
+            return cached
+
+        body = build_text_request(prompt)
+        tried = set()
+
+        async def attempt(remaining):
+            if on_start:
+                on_start()
+            data = await self._request_once(self.TEXT_MODEL, body, tried, remaining, on_chunk=on_chunk)
+            if usage is not None:
+                usage.update(extract_usage(data))
+            text = extract_text(data)
+            if not text:
                 raise Exception("응답에 텍스트가 없습니다.")
-            
+            return text
+
+        try:
+            text = await self.retry_policy.run(attempt, validate=validate, deadline=deadline)
+            self.response_cache.put(cache_key, text)
+            return text
+        except CircuitOpenError as e:
+            print(f"🚫 {e}")
+        except RetryExhaustedError as e:
+            print(f"❌ 텍스트 생성 실패: {e} (마지막 오류: {e.last_error})")
         except Exception as e:
-            print(f"⚠️ API 오류 발생 (키 #{self.current_key_index + 1}): {e}")
-            
-            # API 키 교체 시도
-            if retry_count < len(self.api_keys):
-                print(f"🔄 API 키 교체 시도 ({retry_count + 1}/{len(self.api_keys)})")
-                self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-                print(f"🔑 API 키 #{self.current_key_index + 1}로 전환")
-                genai.configure(api_key=self.api_keys[self.current_key_index])
-                self.text_model = genai.GenerativeModel('gemini-2.0-pro-exp-02-05')
-                time.sleep(1)  # 잠시 대기
-                return self.generate_text(prompt, retry_count + 1)
-            
-            print("❌ 모든 API 키 시도 실패")
-            return "NPC가 응답할 수 없습니다."
+            print(f"❌ 텍스트 생성 실패: {e}")
+        print(f"📊 재시도 통계: {self.retry_stats()}")
+        return self.FAILURE_TEXT
 
+    async def generate_image_async(self, prompt: str) -> bytes:
+        """이미지 생성 코루틴 (같은 모델/프롬프트/파라미터면 디스크 캐시에서 읽음)"""
+        generation_config = {"responseModalities": ["TEXT", "IMAGE"]}
+        cache_key = self.image_cache.make_key(self.IMAGE_MODEL, prompt, generation_config)
+        cached = self.image_cache.get(cache_key)
+        if cached is not None:
+            print("⚡ 캐시된 이미지 사용")
+            return cached
+
+        body = build_text_request(prompt, generation_config)
+        tried = set()
+
+        async def attempt(remaining):
+            return await self._request_once(self.IMAGE_MODEL, body, tried, remaining)
 
-    def generate_image(self, prompt: str) -> bytes:
         try:
-            response = self.vision_model.generate_content(
-                contents=[genai.ImagePart(data=None, mime_type=None), genai.TextPart(text=prompt)]
-            )
-            if response._result.candidates and response._result.candidates[0].content.parts:
-                image_part = response._result.candidates[0].content.parts[0]
-                if hasattr(image_part, 'data'):
-                    return image_part.data
-                else:
-                    print(f"이미지 생성 오류: 응답 Part에 'data' 필드가 없습니다. 응답 구조 변경되었을 수 있습니다.")
-                    print(f"응답 객체 구조: {response._result.candidates[0].content.parts[0]}")
-                    print(f"전체 응답 객체: {response}")
-                    return None
+            data = await self.retry_policy.run(attempt)
+            image = extract_image(data)
+            if image is None:
+                print(f"이미지 생성 오류: 응답에서 이미지 데이터를 찾을 수 없습니다.")
             else:
-                print(f"이미지 생성 오류: 응답에서 이미지 데이터를 찾을 수 없습니다. 후보자 또는 Part가 없습니다.")
-                print(f"전체 응답 객체: {response}")
-                return None
+                self.image_cache.put(cache_key, image)
+            return image
         except Exception as e:
             print(f"이미지 생성 오류: {e}")
             return None
 
+    def cache_stats(self) -> dict:
+        """응답 캐시 적중/실패 통계"""
+        return self.response_cache.snapshot()
+
+    def retry_stats(self) -> dict:
+        """시도 횟수, 낭비된 호출 수, 서킷 브레이커 상태"""
+        return self.retry_policy.snapshot()
+
+    def prompt_stats(self) -> dict:
+        """최근 턴들의 평균 프롬프트/응답 크기와 지연 시간"""
+        return self.prompt_metrics.snapshot()
+
+    def submit(self, coro):
+        """코루틴을 클라이언트 이벤트 루프에서 실행 (concurrent.futures.Future 반환)"""
+        return self.client.submit(coro)
+
+    def image_cache_stats(self) -> dict:
+        """이미지 캐시 적중/용량 통계"""
+        return self.image_cache.snapshot()
+
+    def close(self):
+        """비동기 클라이언트와 응답/이미지 캐시, 프롬프트 통계 기록 종료"""
+        self.client.close()
+        self.response_cache.close()
+        self.image_cache.close()
+        self.prompt_metrics.close()
+
 # ------------------------------
 # 2. 데이터 관리 클래스
 # ------------------------------
@@ -132,6 +338,18 @@ class DataManager:
         }
         self.DATA_DIR = "data"
         self.EMOTION_DIR = "emotion"
+        # 감정 상태는 메모리에서 관리하고 파일 저장은 백그라운드에서 모아서 처리
+        self.emotion_store = EmotionStore(self.EMOTION_DIR)
+        # 감정 키워드 사전은 한 번만 컴파일해 두고 대화마다 재사용
+        self.emotion_lexicon = EmotionLexicon()
+        # 학생 프로필은 _extends 템플릿 병합과 검증을 한 번만 하고 캐시
+        self.profiles = ProfileRepository(self.DATA_DIR, validator=self.validate_npc_data)
+        # 프롬프트에 넣을 NPC 정보 문단은 상세 수준별로 미리 만들어 둠
+        self.context_packs = ContextPackStore(self.profiles)
+        # 프롬프트 템플릿은 한 번 컴파일해 두고 파일이 바뀔 때만 다시 컴파일
+        self.templates = TemplateStore()
+        self.DIALOGUE_TEMPLATE = "dialogue.txt"
+        self.EMOTION_TEMPLATE = os.path.join(self.EMOTION_DIR, "makingemotion.txt")
         self.load_data()
         self.initialize_emotion_files()
         self.randomly_assign_npcs_to_locations()
@@ -140,23 +358,35 @@ class DataManager:
         """게임 시작 시 감정 상태 초기화"""
         try:
             for npc_name, npc_number in self.npc_number_mapping.items():
-                # data 폴더 경로 추가
-                json_path = os.path.join(self.DATA_DIR, f"student_{npc_number}.json")
-                emotion_path = os.path.join(self.EMOTION_DIR, f"emotion{npc_number}.txt")
-                
-                # student_*.json 파일에서 감정 상태 로드
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    npc_data = json.load(f)
-                    emotional_stats = npc_data['psychology']['emotional_stats']
-                
-                # emotion*.txt 파일에 저장
-                os.makedirs(self.EMOTION_DIR, exist_ok=True)  # emotion 디렉토리 생성
-                with open(emotion_path, 'w', encoding='utf-8') as f:
-                    json.dump(emotional_stats, f, ensure_ascii=False, indent=2)
+                # 캐시된 학생 프로필에서 감정 상태 로드
+                npc_data = self.profiles.get_by_number(npc_number)
+                if npc_data is None:
+                    print(f"⚠️ {npc_name}의 프로필이 없어 감정 상태를 초기화하지 못했습니다.")
+                    continue
+                emotional_stats = npc_data['psychology']['emotional_stats']
+                
+                # 메모리 저장소에 올리면 emotion*.txt 파일은 백그라운드에서 저장됨
+                self.emotion_store.set(npc_number, emotional_stats)
                 print(f"✅ {npc_name}의 감정 상태 초기화 완료")
         except Exception as e:
             print(f"감정 상태 초기화 중 오류 발생: {e}")
 
+    def get_npc_context_variants(self, npc_name, detail="standard"):
+        """detail부터 점점 짧아지는 NPC 정보 문단 목록 (프롬프트 예산 맞추기용)"""
+        try:
+            return self.context_packs.variants(npc_name, detail)
+        except Exception as e:
+            print(f"❌ NPC 컨텍스트 팩 조회 중 오류 발생: {e}")
+            return [f"이름: {npc_name}\n"]
+
+    def get_npc_context(self, npc_name, detail="standard"):
+        """프롬프트용 NPC 정보 문단 (캐시된 컨텍스트 팩)"""
+        try:
+            return self.context_packs.get(npc_name, detail)
+        except Exception as e:
+            print(f"❌ NPC 컨텍스트 팩 조회 중 오류 발생: {e}")
+            return f"이름: {npc_name}\n"
+
     def get_npc_number(self, npc_name):
         """NPC 이름에 해당하는 번호 반환"""
         try:
@@ -170,10 +400,8 @@ class DataManager:
         try:
             npc_number = self.get_npc_number(npc_name)
             if npc_number:
-                # data 폴더 경로 추가
-                file_path = os.path.join(self.DATA_DIR, f"student_{npc_number}.json")
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                # 파일을 다시 읽지 않고 캐시된 (읽기 전용) 프로필 반환
+                return self.profiles.get_by_number(npc_number)
         except Exception as e:
             print(f"NPC 데이터 로드 중 오류 발생: {e}")
         return None
@@ -195,22 +423,10 @@ class DataManager:
                 self.data = {"locations": self.locations}
 
             self.npcs = self.load_npcs()
-            self.npc_data = {}
-            self.all_npc_names = []
-            
-            # NPC 데이터 로드
-            for i in range(1, 6):
-                try:
-                    json_path = os.path.join(self.DATA_DIR, f"student_{i}.json")
-                    with open(json_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        data = self.validate_npc_data(data)
-                        if data:
-                            npc_name = data['name']
-                            self.npc_data[npc_name] = data
-                            self.all_npc_names.append(npc_name)
-                except Exception as e:
-                    print(f"⚠️ Error loading NPC data for student_{i}.json: {e}")
+            # NPC 데이터 로드 (_extends 병합 + 검증)
+            self.npc_data = self.profiles.load_all()
+            self.all_npc_names = self.profiles.names()
+            self.context_packs.build_all()
 
             self.randomly_assign_npcs_to_locations()
 
@@ -224,78 +440,36 @@ class DataManager:
             npcs[npc_id] = npc_data
         return npcs
 
-    def load_emotion_prompt_template(self, filepath="emotion/makingemotion.txt"): # 감정 프롬프트 템플릿 로드 함수
+    def load_emotion_prompt_template(self, filepath=None): # 감정 프롬프트 템플릿 로드 함수
+        """컴파일된 감정 변화 프롬프트 템플릿 반환 (render(data)로 채움)"""
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                template = f.read()
-                print(f"😀 감정 변화 프롬프트 템플릿 로드 완료: {filepath}")
-                return template
+            template = self.templates.get(filepath or self.EMOTION_TEMPLATE)
+            if template is None:
+                print(f"⚠️ 감정 변화 프롬프트 템플릿 파일이 없습니다: {filepath or self.EMOTION_TEMPLATE}")
+            return template
         except Exception as e:
             print(f"⚠️ 감정 변화 프롬프트 템플릿 로드 오류: {e}")
-            return ""
+            return None
 
-    def load_emotion_prompt(self, filepath="emotion/makingemotion.txt"):
+    def load_emotion_prompt(self, filepath=None):
         """감정 변화 프롬프트 로드"""
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                return f.read()
-        except Exception as e:
-            print(f"감정 변화 프롬프트 로드 오류: {e}")
-            return ""
-
-    def load_emotion_values_from_files(self):
-        """감정 파일에서 감정 수치 로드 또는 초기화"""
-        for i, npc_name in enumerate(self.all_npc_names):
-            emotion_file = f"emotion/emotion{i+1}.txt"
-            initial_psychology = self.get_npc_base_psychology(npc_name).get('mental_health', {}) # 초기 심리 정보
-
-            if os.path.exists(emotion_file):
-                try:
-                    with open(emotion_file, "r", encoding="utf-8") as f:
-                        emotion_data = json.load(f)
-                        if isinstance(emotion_data, dict): # dict type check
-                            self.npc_data[npc_name]['psychology']['mental_health'] = emotion_data
-                            print(f"😀 {npc_name} 감정 상태 '{emotion_file}' 파일에서 로드 완료: {emotion_data}")
-                        else:
-                            print(f"⚠️ {npc_name} 감정 파일 '{emotion_file}' 형식 오류, 초기화.")
-                            self.npc_data[npc_name]['psychology']['mental_health'] = initial_psychology
-                            self.save_emotion_values_to_files() # 초기화 후 저장
-                except json.JSONDecodeError:
-                    print(f"⚠️ {npc_name} 감정 파일 '{emotion_file}' JSON 디코드 오류, 초기화.")
-                    self.npc_data[npc_name]['psychology']['mental_health'] = initial_psychology
-                    self.save_emotion_values_to_files() # 초기화 후 저장
-
-            else:
-                print(f"🆕 {npc_name} 감정 파일 '{emotion_file}' 새로 생성 및 초기화.")
-                self.npc_data[npc_name]['psychology']['mental_health'] = initial_psychology
-                self.save_emotion_values_to_files() # 파일 생성 및 초기값 저장
-
-    def save_emotion_values_to_files(self):
-        """현재 감정 수치를 emotion 파일에 저장"""
-        for i, npc_name in enumerate(self.all_npc_names):
-            emotion_file = f"emotion/emotion{i+1}.txt"
-            emotion_data = self.npc_data[npc_name]['psychology']['mental_health']
-            try:
-                with open(emotion_file, "w", encoding="utf-8") as f:
-                    json.dump(emotion_data, f, ensure_ascii=False, indent=2)
-                print(f("💾 {npc_name} 감정 상태 '{emotion_file}' 파일에 저장 완료: {emotion_data}"))
-            except Exception as e:
-                print(f"⚠️ {npc_name} 감정 파일 '{emotion_file}' 저장 오류: {e}")
+        template = self.load_emotion_prompt_template(filepath)
+        return template.source if template is not None else ""
 
     def reset_emotion_files(self):
         """게임 종료 시 감정 파일을 student json 파일의 초기값으로 초기화"""
         print("🔄 게임 종료: 감정 파일 초기화 시작...")
         for i, npc_name in enumerate(self.all_npc_names):
-            emotion_file = f"emotion/emotion{i+1}.txt"
-            initial_psychology = self.get_npc_base_psychology(npc_name).get('mental_health', {})
-            try:
-                with open(emotion_file, "w", encoding="utf-8") as f:
-                    json.dump(initial_psychology, f, ensure_ascii=False, indent=2)
-                print(f"🔄 {npc_name} 감정 상태 '{emotion_file}' 초기화 완료 (student json): {initial_psychology}")
-            except Exception as e:
-                print(f"⚠️ {npc_name} 감정 파일 '{emotion_file}' 초기화 오류: {e}")
+            initial_psychology = thaw(self.get_npc_base_psychology(npc_name).get('mental_health', {}))
+            self.emotion_store.set(str(i + 1), initial_psychology)
+            print(f"🔄 {npc_name} 감정 상태 초기화 완료 (student json): {initial_psychology}")
+        self.emotion_store.flush()
         print("🔄 감정 파일 초기화 완료.")
 
+    def close(self):
+        """백그라운드 감정 저장을 멈추고 남은 변경분을 파일에 기록"""
+        self.emotion_store.close()
+
 
     def randomly_assign_npcs_to_locations(self):
         """NPC들을 랜덤하게 위치에 할당"""
@@ -358,7 +532,7 @@ class DataManager:
         return self.npcs.get(npc_name)
 
     def get_npc_base_psychology(self, name: str) -> Dict: # student json 파일의 psychology 정보 반환
-        npc_data = self.npc_data.get(name, {})
+        npc_data = self.profiles.get(name) or {}
         return npc_data.get('psychology', {})
 
     def get_location_npcs(self, location: str) -> list:
@@ -392,17 +566,10 @@ class DataManager:
                 # NPC 번호 가져오기
                 npc_number = self.get_npc_number(npc_name)
                 
-                # emotion*.txt 파일에 저장
-                emotion_file = f"emotion/emotion{npc_number}.txt"
+                # 메모리 저장소 갱신 (emotion*.txt 파일 저장은 백그라운드에서 처리)
+                self.emotion_store.set(npc_number, final_emotions)
                 
-                # 디렉토리 확인 및 생성
-                os.makedirs(os.path.dirname(emotion_file), exist_ok=True)
-                
-                # 감정 상태를 JSON 형식으로 저장
-                with open(emotion_file, 'w', encoding='utf-8') as f:
-                    json.dump(final_emotions, f, ensure_ascii=False, indent=2)
-                
-                print(f"✅ 감정 상태 저장 완료: {emotion_file}")
+                print(f"✅ 감정 상태 갱신 완료: {npc_name} (emotion{npc_number}.txt 저장 예약)")
                 return final_emotions
                 
             else:
@@ -417,82 +584,59 @@ class DataManager:
         
         return None
 
+    DEFAULT_EMOTIONS = {
+        "trust": "50",
+        "intimacy": "50",
+        "respect": "50",
+        "hostility": "50",
+        "annoyance": "50",
+        "curiosity": "50",
+        "wariness": "50"
+    }
+
     def get_current_emotions(self, npc_name):
-        """현재 감정 상태 로드"""
+        """현재 감정 상태 반환 (메모리 저장소 우선, 처음 한 번만 파일에서 로드)"""
         try:
             # NPC 번호 확인
             npc_number = self.get_npc_number(npc_name)
-            emotion_file = f"emotion/emotion{npc_number}.txt"
+
+            emotions = self.emotion_store.get(npc_number)
+            if emotions is not None:
+                return emotions
 
             try:
-                # 파일에서 감정 상태 읽기
-                with open(emotion_file, 'r', encoding='utf-8') as f:
-                    emotions = json.load(f)
-                    print(f"✅ 감정 상태 로드 완료: {emotion_file}")
-                    return emotions
+                # 파일에서 감정 상태 읽기 (이후에는 메모리에서 반환)
+                emotions = self.emotion_store.load(npc_number)
+                print(f"✅ 감정 상태 로드 완료: {self.emotion_store.path_for(npc_number)}")
+                return emotions
                     
             except FileNotFoundError:
                 # 파일이 없는 경우 기본값 설정
-                print(f"⚠️ 감정 상태 파일 없음, 기본값 사용: {emotion_file}")
-                emotions = {
-                    "trust": "50",
-                    "intimacy": "50",
-                    "respect": "50",
-                    "hostility": "50",
-                    "annoyance": "50",
-                    "curiosity": "50",
-                    "wariness": "50"
-                }
-                # 기본값을 파일에 저장
-                with open(emotion_file, 'w', encoding='utf-8') as f:
-                    json.dump(emotions, f, ensure_ascii=False, indent=2)
-                return emotions
+                print(f"⚠️ 감정 상태 파일 없음, 기본값 사용: {self.emotion_store.path_for(npc_number)}")
                 
             except json.JSONDecodeError:
                 # JSON 형식이 아닌 경우 기본값 설정
-                print(f"⚠️ 감정 상태 파일 JSON 형식 오류, 기본값 사용: {emotion_file}")
-                emotions = {
-                    "trust": "50",
-                    "intimacy": "50",
-                    "respect": "50",
-                    "hostility": "50",
-                    "annoyance": "50",
-                    "curiosity": "50",
-                    "wariness": "50"
-                }
-                # 기본값을 파일에 저장
-                with open(emotion_file, 'w', encoding='utf-8') as f:
-                    json.dump(emotions, f, ensure_ascii=False, indent=2)
-                return emotions
+                print(f"⚠️ 감정 상태 파일 JSON 형식 오류, 기본값 사용: {self.emotion_store.path_for(npc_number)}")
+
+            # 기본값을 저장소에 넣어 파일에도 저장되도록 함
+            emotions = dict(self.DEFAULT_EMOTIONS)
+            self.emotion_store.set(npc_number, emotions)
+            return emotions
 
         except Exception as e:
             print(f"❌ 감정 상태 로드 중 오류 발생: {e}")
             traceback.print_exc()
             # 기본값 반환
-            return {
-                "trust": "50",
-                "intimacy": "50",
-                "respect": "50",
-                "hostility": "50",
-                "annoyance": "50",
-                "curiosity": "50",
-                "wariness": "50"
-            }
+            return dict(self.DEFAULT_EMOTIONS)
 
     def load_dialogue_template(self):
-        """대화 템플릿 로드"""
+        """컴파일된 대화 템플릿 반환 (파일이 바뀌었을 때만 다시 읽음)"""
         try:
             # dialogue_template.txt 대신 dialogue.txt 사용
-            template_file = "dialogue.txt"
-            
-            if os.path.exists(template_file):
-                with open(template_file, 'r', encoding='utf-8') as f:
-                    template = f.read()
-                print(f"✅ 대화 템플릿 로드 완료: {template_file}")
-                return template
-            else:
-                print(f"❌ 대화 템플릿 파일을 찾을 수 없음: {template_file}")
-                return None
+            template = self.templates.get(self.DIALOGUE_TEMPLATE)
+            if template is None:
+                print(f"❌ 대화 템플릿 파일을 찾을 수 없음: {self.DIALOGUE_TEMPLATE}")
+            return template
             
         except Exception as e:
             print(f"❌ 대화 템플릿 로드 중 오류 발생: {e}")
@@ -537,103 +681,94 @@ class DataManager:
         relationship_level = positive_avg - negative_avg
         return max(0, min(100, relationship_level))  # 0~100 범위로 제한
 
+    def apply_emotion_deltas(self, npc_number, current, deltas, min_change=0.05):
+        """감정 벡터에 변화량 벡터 적용 후 저장, 바뀐 감정만 {감정: (이전 값, 새 값)} 반환
+
+        변화량은 감정마다 ±10, 결과는 0~100으로 제한하며 min_change 이하로 바뀐 값은 무시합니다.
+        값이 없는 감정(NaN)은 그대로 NaN으로 남습니다.
+        """
+        updated = np.round(np.clip(current + np.clip(deltas, -10.0, 10.0), 0, 100), 1)
+        changed = np.abs(updated - current) > min_change
+        if not changed.any():
+            return {}
+        updated = np.where(changed, updated, current)
+        self.emotion_store.set_vector(npc_number, updated)
+        return {
+            EMOTION_NAMES[i]: (float(round(current[i], 1)), float(updated[i])) for i in np.flatnonzero(changed)
+        }
+
+    def apply_emotion_changes(self, npc_name, changes):
+        """모델이 제공한 감정 변화량 적용 ({감정: {"delta": 변화량, "reason": 이유}})"""
+        try:
+            npc_number = self.get_npc_number(npc_name)
+            self.get_current_emotions(npc_name)  # 저장소에 없으면 파일에서 로드
+            current = self.emotion_store.get_vector(npc_number)
+            if current is None:
+                return {}
+
+            deltas = np.zeros_like(current)
+            for emotion, change in changes.items():
+                index = EMOTION_INDEX.get(emotion)
+                if index is None:
+                    continue
+                try:
+                    deltas[index] = float(change.get("delta", 0))
+                except (TypeError, ValueError, AttributeError):
+                    print(f"❌ 감정 변화량 형식 오류: {emotion}={change}")
+
+            emotion_changes = self.apply_emotion_deltas(npc_number, current, deltas)
+            if emotion_changes:
+                print(f"✅ {npc_name}의 감정 변화 적용: {len(emotion_changes)}개 감정 변화")
+            return emotion_changes
+
+        except Exception as e:
+            print(f"❌ 감정 변화 적용 중 오류 발생: {e}")
+            traceback.print_exc()
+            return {}
+
     def analyze_and_update_emotions(self, npc_name, user_message, ai_response, inner_thoughts):
         """감정 상태 분석 및 업데이트"""
         try:
-            # 현재 감정 상태 로드
-            current_emotions = self.get_current_emotions(npc_name)
-            if not current_emotions:
+            # 현재 감정 상태 로드 (저장소에 없으면 파일에서)
+            npc_number = self.get_npc_number(npc_name)
+            self.get_current_emotions(npc_name)
+            current = self.emotion_store.get_vector(npc_number)
+            if current is None:
                 print("❌ 현재 감정 상태를 불러올 수 없습니다.")
                 return {}
                 
-            emotion_changes = {}
-            
-            # 감정 키워드 매핑
-            emotion_keywords = {
-                'trust': ['신뢰', '믿음', '의지'],
-                'intimacy': ['친밀', '가까움', '친근'],
-                'respect': ['존경', '존중', '인정'],
-                'bond': ['유대', '연결', '공감'],
-                'cooperation': ['협력', '협동', '도움'],
-                'rivalry': ['경쟁', '대립', '견제'],
-                'fellowship': ['동료애', '우정', '친구'],
-                'mentoring': ['가르침', '지도', '조언'],
-                'hostility': ['적대', '미움', '반감'],
-                'betrayal': ['배신', '실망', '배반'],
-                'resentment': ['분노', '화남', '격분'],
-                'distrust': ['불신', '의심', '불안'],
-                'envy': ['질투', '시기', '부러움'],
-                'guilt': ['죄책감', '후회', '미안'],
-                'admiration': ['감탄', '존경', '동경'],
-                'loyalty': ['충성', '헌신', '충실'],
-                'fear': ['두려움', '공포', '무서움'],
-                'avoidance': ['회피', '도망', '기피'],
-                'rejection': ['거절', '거부', '외면'],
-                'curiosity': ['호기심', '궁금', '관심'],
-                'confusion': ['혼란', '혼돈', '당황'],
-                'annoyance': ['짜증', '불만', '성가심'],
-                'wariness': ['경계', '조심', '주의'],
-                'bewilderment': ['당황', '혼란', '놀람']
-            }
-            
-            # 전체 응답 텍스트 (소문자로 변환)
-            response_text = f"{user_message} {ai_response} {inner_thoughts}".lower()
-            
-            # 각 감정에 대해 변화 계산
-            for emotion, keywords in emotion_keywords.items():
-                if emotion in current_emotions:
-                    try:
-                        current_value = float(current_emotions[emotion])
-                        change = 0
-                        
-                        # 키워드 검색 및 맥락 분석
-                        for keyword in keywords:
-                            if keyword in response_text:
-                                # 긍정/부정 맥락 확인
-                                positive_context = any(pos in response_text for pos in 
-                                    ['좋아', '긍정', '기쁘', '행복', '만족', '즐거움', '감사'])
-                                negative_context = any(neg in response_text for neg in 
-                                    ['나쁘', '부정', '슬프', '화나', '실망', '불만', '싫어'])
-                                
-                                # 감정 강도 분석
-                                intensity = 1.0
-                                if any(intens in response_text for intens in ['매우', '정말', '너무', '굉장히']):
-                                    intensity = 2.0
-                                
-                                # 맥락에 따른 변화량 결정
-                                if positive_context:
-                                    change += random.uniform(2.0, 5.0) * intensity
-                                elif negative_context:
-                                    change -= random.uniform(2.0, 5.0) * intensity
-                                else:
-                                    change += random.uniform(-2.0, 2.0) * intensity
-                        
-                        # 의미있는 변화만 처리 (변화량 임계값 낮춤)
-                        if abs(change) > 0.5:
-                            # 변화량 제한
-                            change = max(min(change, 10.0), -10.0)
-                            
-                            # 새 값 계산 및 범위 제한
-                            new_value = max(0, min(100, current_value + change))
-                            
-                            # 유의미한 변화가 있는 경우에만 기록
-                            if abs(new_value - current_value) > 0.5:
-                                # 변화 기록 (이전 값, 새 값)
-                                emotion_changes[emotion] = (current_value, new_value)
-                                
-                                # 감정 상태 업데이트
-                                current_emotions[emotion] = str(round(new_value, 1))
-                    except ValueError:
-                        print(f"❌ 감정 값 변환 오류: {emotion}={current_emotions[emotion]}")
-                        continue
+            # 전체 응답 텍스트를 한 번만 훑어 키워드/맥락 단서/강조 표현을 모두 찾음
+            hits = self.emotion_lexicon.scan(f"{user_message} {ai_response} {inner_thoughts}")
+            
+            # 긍정/부정 맥락과 감정 강도는 텍스트 전체 기준
+            positive_context = bool(hits.positive)
+            negative_context = bool(hits.negative)
+            intensity = 2.0 if hits.intensifiers else 1.0
+            
+            # 키워드가 등장한 감정만 변화량 계산 (값이 없는 감정은 건너뜀)
+            deltas = np.zeros_like(current)
+            for emotion in hits.emotion_hits:
+                index = EMOTION_INDEX.get(emotion)
+                if index is None or np.isnan(current[index]):
+                    continue
+                change = 0
+                
+                # 등장한 서로 다른 키워드마다 맥락에 따른 변화량 누적
+                for _ in hits.keywords_for(emotion):
+                    if positive_context:
+                        change += random.uniform(2.0, 5.0) * intensity
+                    elif negative_context:
+                        change -= random.uniform(2.0, 5.0) * intensity
+                    else:
+                        change += random.uniform(-2.0, 2.0) * intensity
+                
+                # 의미있는 변화만 처리
+                if abs(change) > 0.5:
+                    deltas[index] = change
             
-            # 변화가 있을 경우에만 저장
+            # 유의미한 변화(0.5 초과)만 저장
+            emotion_changes = self.apply_emotion_deltas(npc_number, current, deltas, min_change=0.5)
             if emotion_changes:
-                # 감정 상태 JSON 형식으로 변환
-                emotions_json = json.dumps({"final_emotions": current_emotions})
-                
-                # 감정 상태 업데이트 및 저장
-                self.update_emotion_states(npc_name, emotions_json)
                 print(f"✅ {npc_name}의 감정 변화 감지 및 저장: {len(emotion_changes)}개 감정 변화")
             
             return emotion_changes
@@ -647,11 +782,16 @@ class DataManager:
 # 3. 메인 게임 클래스
 # ------------------------------
 class GameWindow:
+    # 플레이어가 NPC에게 다가와 대화를 시작할 때 NPC의 첫마디를 만들기 위한 메시지
+    GREETING_MESSAGE = "(플레이어가 다가와 말을 건다)"
+
     def __init__(self, root):
         """초기화"""
         try:
             self.root = root
             self.root.title("좀비 아포칼립스 RPG")
+            # 제목 표시줄의 닫기 버튼도 종료 버튼과 같은 정리(감정 저장 등)를 거치도록
+            self.root.protocol("WM_DELETE_WINDOW", self.quit_game)
 
             # CustomTkinter 테마 설정
             ctk.set_appearance_mode("dark")  # 다크 모드
@@ -675,13 +815,26 @@ class GameWindow:
             # 2D 맵 관련 속성
             self.map_window = None  # 맵 창 참조
             self.map_canvas = None  # 맵 캔버스
+            self.map_renderer = None  # 플레이어/NPC 표시 (위치가 바뀐 개체만 다시 그림)
             self.player_pos = [100, 100]  # 플레이어 초기 위치
             self.map_size = (800, 600)  # 맵 크기
             self.player_size = (30, 30)  # 플레이어 크기
             self.npc_positions = {}  # NPC 위치 저장 딕셔너리
             self.current_map = "식당"  # 현재 맵
             self.walkable_areas = []  # 이동 가능 영역
+            self.walk_grid = None  # 이동 가능 영역을 래스터화한 격자
+            self.walk_cell = 2  # 격자 한 칸의 픽셀 크기
+            self.nav_grid = None  # NPC 길찾기용 격자 (연결 요소/경로 캐시 포함)
+            self.npc_wanderer = None  # NPC 배회 이동
+            self.npc_placer = None  # 이동 가능 영역 위 NPC 배치 (포아송 디스크 간격)
+            self.npc_move_interval = 50  # NPC 이동 갱신 주기 (ms)
+            self.npc_move_job = None  # 예약된 NPC 이동 갱신 (root.after id)
             self.map_loaded = False  # 맵 로드 여부
+            self.interaction_radius = 30  # 이 거리 안이면 대화 시작
+            self.approach_radius = 90  # 이 거리 안이면 첫마디를 미리 생성
+            self.approaching_npcs = set()  # 접근 반경 안에 있는 NPC
+            self.npc_spacing = 50  # NPC 사이 최소 거리
+            self.npc_index = SpatialHash(cell_size=self.approach_radius)  # NPC 근접 질의용 공간 해시
             
             # 감정 이름 매핑 설정
             self.emotion_names = {
@@ -768,6 +921,30 @@ class GameWindow:
             
             # AI 모델 매니저 초기화
             self.ai_model = AIModelManager()
+            # NPC별 대화 기억 (최근 대화 + 비동기로 갱신되는 요약)
+            self.memory = ConversationMemory(summarizer=self.summarize_conversation, submit=self.ai_model.submit)
+            # 오래된 대화 중 현재 메시지와 관련된 것을 찾아 프롬프트에 넣기 위한 NPC별 BM25 색인
+            self.conversation_index = ConversationIndex()
+            # 플레이어가 다가올 때 미리 생성해 두는 NPC 첫마디 (추측 실행)
+            self.prefetch = PrefetchCache(ttl=20.0)
+            self.prefetch_max_in_flight = 2  # 이보다 많은 요청이 진행 중이면 미리 생성하지 않음
+            # NPC 턴 생성은 고정된 수의 작업자로만 실행하고, 대화 상대/위치가 바뀌면 이전 요청은 취소
+            self.conversation_epoch = 0
+            self.turn_executor = TurnExecutor(self.ai_model.client.loop, workers=2, max_pending=4)
+            # 연달아 입력한 메시지는 짧게 기다렸다가(또는 진행 중인 턴이 끝나면) 한 번의 요청으로 묶음
+            self.input_coalescer = InputCoalescer(
+                self.root.after, self.root.after_cancel, self.dispatch_player_input, debounce_ms=400,
+                is_live=lambda key: key[0] == self.conversation_epoch,
+            )
+            # NPC 응답을 생성되는 대로 대화창에 표시할지 여부
+            self.stream_responses = True
+            # 스키마로 제한된 JSON 응답 모드 (감정 변화량까지 모델이 직접 제공)
+            self.structured_output = False
+            # 프롬프트에 넣을 NPC 정보의 상세 수준 (minimal / standard / detailed)
+            self.context_detail = "standard"
+            self.emotion_labels = {emotion: f"{name}: " for emotion, name in self.emotion_names.items()}
+            self.dialogue_schema = build_dialogue_schema(list(self.emotion_names))
+            self.dialogue_validator = compile_schema(self.dialogue_schema)
             
             # DataManager 인스턴스 생성
             self.data_manager = DataManager()
@@ -833,17 +1010,18 @@ class GameWindow:
             # 맵 창 캔버스 생성
             self.map_canvas = tk.Canvas(self.map_window, width=self.map_size[0], height=self.map_size[1], bg="black")
             self.map_canvas.pack(fill=tk.BOTH, expand=True)
+            self.map_renderer = MapRenderer(self.map_canvas, self.root.after_idle)
             
             # 맵 로드
             self.load_map(self.current_map)
+            # NPC 이동은 맵 창이 보이는 동안만 (숨겼다가 다시 보이면 이어서)
+            self.map_window.bind("<Map>", lambda event: self.schedule_npc_movement() if event.widget is self.map_window else None)
+            self.schedule_npc_movement()
             
             # 키 이벤트 바인딩
             self.map_window.bind("<KeyPress>", self.handle_key_press)
             self.map_window.focus_set()  # 포커스 설정
             
-            # 맵 업데이트 타이머 설정
-            self.update_map()
-            
         except Exception as e:
             print(f"❌ 맵 창 초기화 중 오류 발생: {e}")
             traceback.print_exc()
@@ -862,8 +1040,10 @@ class GameWindow:
             map_img = map_img.resize(self.map_size, Image.LANCZOS)
             self.map_image = ImageTk.PhotoImage(map_img)
             
-            # 맵 이미지 표시
-            self.map_canvas.create_image(0, 0, anchor="nw", image=self.map_image)
+            # 맵 이미지 표시 (플레이어/NPC 아래에 깔림)
+            self.map_canvas.delete("map")
+            self.map_canvas.create_image(0, 0, anchor="nw", image=self.map_image, tags="map")
+            self.map_canvas.tag_lower("map")
             
             # 문을 찾아서 표시 - 나중에 구현
             
@@ -877,6 +1057,7 @@ class GameWindow:
             self.map_loaded = True
             self.current_map = map_name
             self.map_window.title("2D 맵 - " + map_name)
+            self.update_map()
             
         except Exception as e:
             print(f"❌ 맵 로드 중 오류 발생: {e}")
@@ -1255,6 +1436,10 @@ class GameWindow:
         """NPC 선택 처리"""
         try:
             self.game_state["selected_npc"] = npc_name
+            self.begin_conversation(npc_name)
+            if self.npc_wanderer is not None:
+                # 대화 상대는 가던 길을 버리고 대화가 끝난 뒤 잠시 쉬었다가 다시 움직임
+                self.npc_wanderer.stop(npc_name, time.monotonic())
             print(f"✅ NPC 선택됨: {npc_name}")
             
             # NPC 감정 상태 초기화
@@ -1267,8 +1452,8 @@ class GameWindow:
                     "분노": 50
                 }
             
-            # 대화 기록 초기화
-            self.game_state["conversation_history"] = []
+            # 대화 기록은 NPC별 기억으로 교체 (다른 NPC와 대화해도 지워지지 않음)
+            self.game_state["conversation_history"] = self.memory.history(npc_name)
             
             # 대화창 초기화
             if hasattr(self, 'conversation_text'):
@@ -1475,8 +1660,9 @@ class GameWindow:
             # 창 닫기
             window.destroy()
             
-            # 선택된 NPC 초기화
+            # 선택된 NPC 초기화 (이전 NPC에게 보낸 요청은 취소)
             self.game_state["selected_npc"] = None
+            self.begin_conversation(None)
             if self.location_image_label:
                 self.location_image_label.configure(image='')
             
@@ -1564,8 +1750,8 @@ class GameWindow:
                 return
 
             self.update_conversation(f"나: {message}", "user")
-            # AI 응답 처리 로직 추가
-            self.process_npc_response(self.game_state["selected_npc"], message)
+            # AI 응답 요청은 입력을 모아서 한 번에 (dispatch_player_input)
+            self.input_coalescer.add((self.conversation_epoch, self.game_state["selected_npc"]), message)
 
         except Exception as e:
             print(f"메시지 처리 중 오류 발생: {e}")
@@ -1573,7 +1759,8 @@ class GameWindow:
     def update_conversation(self, message, message_type="user"):
         """대화창 업데이트"""
         try:
-            if not message or not message.strip():
+            is_stream = message_type.startswith("npc_stream")
+            if not is_stream and (not message or not message.strip()):
                 return
             
             self.conversation_text.configure(state='normal')
@@ -1581,7 +1768,7 @@ class GameWindow:
             # 메시지 유형에 따른 포맷팅
             if message_type == "user":
                 formatted_message = f"👤 나: {message}"
-                self.game_state["conversation_history"].append(f"플레이어: {message}")
+                self.memory.append(self.game_state["selected_npc"], f"플레이어: {message}")
                 # 사용자 메시지 하이라이트 - 파란색
                 self.conversation_text.insert('end', formatted_message + "\n\n", ('user',))
                 self.conversation_text._textbox.tag_configure('user', foreground='#4DA6FF')
@@ -1598,6 +1785,21 @@ class GameWindow:
                 self.conversation_text.insert('end', formatted_message + "\n\n", ('npc_full',))
                 self.conversation_text._textbox.tag_configure('npc_full', foreground='#66CC99')
                 # 대화 기록에는 process_npc_response에서 대사만 추가
+            elif message_type == "npc_stream_start":
+                # 스트리밍 응답 시작: 재시도 시 지울 수 있도록 시작 위치 표시
+                self.conversation_text._textbox.mark_set('stream_start', 'end-1c')
+                self.conversation_text._textbox.mark_gravity('stream_start', 'left')
+                self.conversation_text.insert('end', message, ('npc_full',))
+                self.conversation_text._textbox.tag_configure('npc_full', foreground='#66CC99')
+            elif message_type == "npc_stream":
+                # 도착한 대사 조각을 줄바꿈 없이 이어 붙임
+                self.conversation_text.insert('end', message, ('npc_full',))
+            elif message_type == "npc_stream_reset":
+                # 재시도 시 이전 시도의 스트리밍 출력 제거
+                if 'stream_start' in self.conversation_text._textbox.mark_names():
+                    self.conversation_text._textbox.delete('stream_start', 'end-1c')
+            elif message_type == "npc_stream_end":
+                self.conversation_text.insert('end', message + "\n\n", ('npc_full',))
             elif message_type == "system":
                 formatted_message = f"🔧 {message}"
                 # 시스템 메시지 하이라이트 - 회색
@@ -1617,28 +1819,49 @@ class GameWindow:
         except Exception as e:
             print(f"❌ 대화창 업데이트 오류: {e}")
 
-    def process_npc_response(self, npc_name, user_message):
+    def begin_conversation(self, npc_name):
+        """대화 세대를 새로 시작 (이전 세대의 NPC 턴 요청은 실행 전이면 버리고 실행 중이면 취소)"""
+        self.conversation_epoch += 1
+        self.turn_executor.advance(npc_name, self.conversation_epoch)
+        self.input_coalescer.reset()
+
+    def dispatch_player_input(self, key, lines, on_done):
+        """묶인 플레이어 입력으로 NPC 턴 요청 (InputCoalescer가 호출)"""
+        _, npc_name = key
+        self.process_npc_response(npc_name, "\n".join(lines), on_done=on_done)
+
+    async def summarize_conversation(self, npc_name, prompt):
+        """대화 기억 요약 생성 (ConversationMemory가 이벤트 루프에서 호출)"""
+        summary = await self.ai_model.generate_text_async(prompt, deadline=20.0)
+        if not summary or summary == self.ai_model.FAILURE_TEXT:
+            return None
+        return summary
+
+    def format_emotion_state(self, emotions):
+        """감정 상태를 "신뢰: 40%" 형태의 줄들로 변환 (접두어는 미리 만들어 둔 것 사용)"""
+        labels = self.emotion_labels
+        return "\n".join(f"{labels.get(emotion) or emotion + ': '}{value}%" for emotion, value in emotions.items())
+
+    def build_dialogue_prompt(self, npc_name, user_message, synthetic=False):
+        """대화 프롬프트 생성 (프롬프트, generation_config, 예산 보고서) 반환, 실패 시 None
+
+        synthetic이면 user_message는 플레이어가 실제로 한 말이 아니므로(첫마디 유도 등)
+        과거 대화 검색에 쓰지 않습니다.
+        """
         try:
             # dialogue.txt 파일 로드
             dialogue_template = self.data_manager.load_dialogue_template()
             if not dialogue_template:
                 print("❌ 대화 템플릿 로드 실패")
-                self.update_conversation("대화 템플릿을 불러올 수 없습니다.", "system")
-                return
+                return None
 
             # 현재 감정 상태 로드
             current_emotions = self.data_manager.get_current_emotions(npc_name)
             
-            # 감정 상태를 문자열로 변환
-            emotion_lines = []
-            for emotion, value in current_emotions.items():
-                emotion_kr = self.emotion_names.get(emotion, emotion)
-                emotion_lines.append(f"{emotion_kr}: {value}%")
-            emotion_state = "\n".join(emotion_lines)
-            
-            # 대화 기록 문자열로 변환
-            conversation_history = self.game_state["conversation_history"][-5:] if self.game_state["conversation_history"] else []
-            conversation_history_text = "\n".join(conversation_history)
+            # 대화 기억 (관련된 과거 대화 + 이전 대화 요약 + 최근 대화)
+            related = [] if synthetic else self.conversation_index.search(npc_name, user_message, k=3, skip_recent=3)
+            conversation_history = [f"[관련된 이전 대화] {text.replace(chr(10), ' / ')}" for text in related]
+            conversation_history += self.memory.prompt_lines(npc_name)
             
             # 현재 위치 정보 가져오기
             current_location = self.game_state.get('current_location', '알 수 없음')
@@ -1652,29 +1875,15 @@ class GameWindow:
             current_npcs = self.data_manager.get_location_npcs(current_location)
             npc_count = len(current_npcs)
             
-            # NPC 정보 섹션 생성
-            npc_info = self.data_manager.get_npc_data(npc_name)
-            npc_info_sections = ""
-            if npc_info:
-                npc_info_sections = f"이름: {npc_name}\n"
-                # persona가 core_info 내부에 있는 경우 처리
-                if 'core_info' in npc_info and 'persona' in npc_info['core_info']:
-                    persona = npc_info['core_info']['persona']
-                    if 'personality_rules' in persona:
-                        npc_info_sections += f"성격: {persona['personality_rules']}\n"
-                    if 'speech_style' in persona:
-                        npc_info_sections += f"말투: {persona['speech_style']}\n"
-            
             # 플레이어 정보 (필요에 따라 수정)
             player_name = "플레이어"
             player_rel_emotional_state = "정상"
             
             # dialogue.txt 템플릿에 전달할 데이터 준비
+            # (감정/대화 기록/NPC 정보는 예산에 맞춘 뒤 채움)
             prompt_data = {
                 "npc_name": npc_name,
                 "current_emotions": current_emotions,
-                "emotion_state": emotion_state,
-                "conversation_history_text": conversation_history_text,
                 "current_location": current_location,
                 "location_description": location_description,
                 "current_time": current_time,
@@ -1683,120 +1892,312 @@ class GameWindow:
                 "player_rel_emotional_state": player_rel_emotional_state,
                 "player_message": user_message,
                 "npc_count": npc_count,
-                "npc_info_sections": npc_info_sections
             }
 
-            # 안전한 템플릿 포맷팅 함수
-            def safe_format(template, data):
-                # 모든 포맷 필드를 추출
-                import re
-                fields = re.findall(r'\{([^}]+)\}', template)
-                
-                # 각 필드를 안전하게 대체
-                result = template
-                for field in fields:
-                    placeholder = '{' + field + '}'
-                    if field in data and data[field] is not None:
-                        result = result.replace(placeholder, str(data[field]))
-                    else:
-                        result = result.replace(placeholder, "")
-                
-                return result
-            
-            # 대화 프롬프트 포맷팅
+            # 줄일 수 있는 구역은 우선순위가 낮은 것부터 줄임
+            # (중립에 가까운 감정 < 오래된 대화 기록 < NPC 정보 상세 수준)
+            sections = [
+                PromptSection("emotion_state", emotion_variants(current_emotions, self.emotion_labels), priority=0),
+                PromptSection("conversation_history_text", history_variants(conversation_history), priority=1),
+                PromptSection("npc_info_sections",
+                              self.data_manager.get_npc_context_variants(npc_name, self.context_detail), priority=2),
+            ]
+
+            # 대화 프롬프트 포맷팅 (없는 필드는 빈 문자열로 채움)
             try:
-                dialogue_prompt = safe_format(dialogue_template, prompt_data)
+                # 템플릿 지시문 등 고정 부분의 크기를 재고 남은 예산에 구역들을 맞춤
+                fixed_tokens = estimate_tokens(dialogue_template.render(prompt_data))
+                if self.structured_output:
+                    fixed_tokens += estimate_tokens(STRUCTURED_OUTPUT_INSTRUCTION)
+                fitted, budget_report = PromptBudgeter(self.ai_model.prompt_budget()).fit(sections, fixed_tokens)
+                prompt_data.update(fitted)
+                dialogue_prompt = dialogue_template.render(prompt_data)
             except Exception as e:
                 print(f"❌ 대화 프롬프트 포맷팅 오류: {e}")
+                return None
+
+            # 구조화 출력 모드: 스키마로 제한된 JSON을 요청하고 검증 실패 시에만 휴리스틱 파싱
+            generation_config = None
+            if self.structured_output:
+                dialogue_prompt += STRUCTURED_OUTPUT_INSTRUCTION
+                generation_config = {
+                    "responseMimeType": "application/json",
+                    "responseSchema": self.dialogue_schema,
+                }
+
+            return dialogue_prompt, generation_config, budget_report
+        except Exception as e:
+            print(f"❌ 대화 프롬프트 생성 중 오류: {e}")
+            traceback.print_exc()
+            return None
+
+    def prefetch_greeting(self, npc_name):
+        """플레이어가 접근 반경에 들어온 NPC의 첫마디를 낮은 우선순위로 미리 생성"""
+        try:
+            if npc_name == self.game_state.get("selected_npc"):
+                return
+            if self.ai_model.client.in_flight >= self.prefetch_max_in_flight:
+                return  # 진행 중인 대화 요청이 우선
+            built = self.build_dialogue_prompt(npc_name, self.GREETING_MESSAGE, synthetic=True)
+            if built is None:
+                return
+            prompt, generation_config, _ = built
+            if self.prefetch.matches(npc_name, prompt):
+                return
+
+            def is_valid_response(text):
+                return self.parse_dialogue_response(text).is_valid
+
+            self.prefetch.start(npc_name, prompt, lambda: self.ai_model.submit(
+                self.ai_model.generate_text_async(prompt, validate=is_valid_response,
+                                                  generation_config=generation_config)
+            ))
+            print(f"🔮 {npc_name}의 첫마디 미리 생성 시작")
+        except Exception as e:
+            print(f"⚠️ 첫마디 미리 생성 중 오류: {e}")
+
+    def parse_dialogue_response(self, ai_response):
+        """NPC 응답 파싱 (구조화 출력 모드면 스키마 검증 후 파싱)"""
+        if self.structured_output:
+            return parse_structured_response(ai_response or "", self.dialogue_validator)
+        return parse_npc_response(ai_response or "")
+
+    def process_npc_response(self, npc_name, user_message, on_done=None, synthetic=False):
+        """NPC 턴 요청 (on_done은 턴이 끝나거나 요청하지 못했을 때 UI 스레드에서 호출됨)
+
+        synthetic이면 user_message는 플레이어의 실제 발화가 아니므로(GREETING_MESSAGE 등)
+        검색 색인에 넣지 않고 감정 분석도 하지 않습니다.
+        """
+        dispatched = False
+        try:
+            built = self.build_dialogue_prompt(npc_name, user_message, synthetic=synthetic)
+            if built is None:
                 self.update_conversation("대화 프롬프트 생성 중 오류가 발생했습니다.", "system")
                 return
+            dialogue_prompt, generation_config, budget_report = built
 
-            def generate_response():
-                max_retries = 3
-                retry_count = 0
-                
-                while retry_count < max_retries:
+            # 이 요청의 취소 표시: 대화 상대나 위치가 바뀌면 취소되어 결과를 버림
+            token = self.turn_executor.token(npc_name, self.conversation_epoch)
+
+            def post(callback):
+                """UI 스레드에서 실행하되, 그 사이 취소된 요청이면 무시"""
+                self.root.after(0, lambda: None if token.cancelled else callback())
+
+            # 다가올 때 미리 생성해 둔 첫마디가 지금과 같은 상황(프롬프트)이면 그 결과를 사용
+            prefetched = self.prefetch.take(npc_name, dialogue_prompt)
+
+            parse_response = self.parse_dialogue_response
+
+            # 턴별 프롬프트/응답 크기 기록
+            turn = self.ai_model.prompt_metrics.begin(npc_name, self.ai_model.TEXT_MODEL, budget_report)
+            usage = {}
+
+            def handle_response(ai_response, streamed=False):
+                """유효한 응답이면 UI 갱신을 예약하고 True 반환 (streamed면 대화창 출력은 이미 끝난 상태)"""
+                print(f"📝 AI 응답:\n{ai_response}")  # 디버깅용
+                if token.cancelled:
+                    print(f"🗑️ 대화가 바뀌어 {npc_name}의 응답을 버립니다.")
+                    return True
+                self.ai_model.prompt_metrics.finish(turn, ai_response, usage)
+
+                # 응답은 한 번만 파싱해서 검증과 UI 갱신에 함께 사용
+                parsed = parse_response(ai_response)
+                if not parsed.is_valid:
+                    return False
+
+                def update_ui():
                     try:
-                        # 응답 생성 중임을 표시
-                        if retry_count == 0:  # 첫 시도에만 표시
-                            self.root.after(0, lambda: self.update_conversation(f"{npc_name}이(가) 응답 중...", "system"))
-                        
-                        # AI 응답 생성
-                        ai_response = self.ai_model.generate_text(dialogue_prompt)
-                        print(f"📝 AI 응답:\n{ai_response}")  # 디버깅용
-                        
-                        # 유효한 응답인지 확인
-                        if not ai_response or not self.extract_response_part(ai_response, "대사"):
-                            print(f"⚠️ 유효하지 않은 응답, 재시도 {retry_count+1}/{max_retries}")
-                            retry_count += 1
-                            continue
-
-                        def update_ui():
-                            try:
-                                # NPC 응답 텍스트 추출
-                                speech = self.extract_response_part(ai_response, "대사")
-                                action = self.extract_response_part(ai_response, "행동")
-                                inner_thought = self.extract_response_part(ai_response, "속마음")
+                        # NPC 응답 텍스트 추출
+                        speech = parsed.speech
+                        action = parsed.action
+                        inner_thought = parsed.inner_thought
                                 
-                                # 대화창에 표시할 응답 구성 - 더 간결하게 표시
-                                formatted_response = f"{npc_name}: {speech or '...'}"
+                        if streamed:
+                            # 대사와 행동/속마음은 스트리밍 중에 이미 표시됨
+                            self.update_conversation("", "npc_stream_end")
+                        else:
+                            # 대화창에 표시할 응답 구성 - 더 간결하게 표시
+                            formatted_response = f"{npc_name}: {speech or '...'}"
                                 
-                                if action:
-                                    formatted_response += f"\n[{action}]"
+                            if action:
+                                formatted_response += f"\n[{action}]"
                                 
-                                if inner_thought:
-                                    formatted_response += f"\n(속마음: {inner_thought})"
+                            if inner_thought:
+                                formatted_response += f"\n(속마음: {inner_thought})"
                                 
-                                # 대화창에 표시
-                                self.update_conversation(formatted_response, "npc_full")
+                            # 대화창에 표시
+                            self.update_conversation(formatted_response, "npc_full")
                                 
-                                # 대화 기록에는 대사만 추가
-                                if speech:
-                                    self.game_state["conversation_history"].append(f"{npc_name}: {speech}")
+                        # 대화 기록에는 대사만 추가
+                        if speech:
+                            self.memory.append(npc_name, f"{npc_name}: {speech}")
+                            if not synthetic:
+                                # 플레이어 말과 대사를 한 쌍으로 검색 색인에 추가
+                                self.conversation_index.add(npc_name, f"플레이어: {user_message}\n{npc_name}: {speech}")
                                 
-                                # 감정 상태 변화 분석 및 업데이트
-                                emotion_changes = self.data_manager.analyze_and_update_emotions(
-                                    npc_name, user_message, speech or "", inner_thought or ""
-                                )
+                        # 감정 상태 변화 분석 및 업데이트 (모델이 변화량을 주면 그대로 적용)
+                        if synthetic:
+                            # 플레이어가 실제로 한 말이 없으므로 감정은 그대로
+                            emotion_changes = {}
+                        elif self.structured_output and parsed.emotion_changes:
+                            emotion_changes = self.data_manager.apply_emotion_changes(
+                                npc_name, parsed.emotion_changes
+                            )
+                        else:
+                            emotion_changes = self.data_manager.analyze_and_update_emotions(
+                                npc_name, user_message, speech or "", inner_thought or ""
+                            )
                                 
-                                # 감정 패널 업데이트
-                                self.update_emotion_panel()
+                        # 감정 패널 업데이트
+                        self.update_emotion_panel()
                                 
-                                # 감정 변화 패널 업데이트
-                                self.update_emotion_change_panel(emotion_changes, npc_name)
+                        # 감정 변화 패널 업데이트
+                        self.update_emotion_change_panel(emotion_changes, npc_name)
                                 
-                                # 감정 상태 파일 저장
-                                npc_number = self.get_npc_number(npc_name)
-                                current_emotions = self.data_manager.get_current_emotions(npc_name)
-                                self.save_emotion_state_to_file(npc_name, npc_number, current_emotions)
+                        # 감정 상태는 DataManager의 메모리 저장소에 이미 반영되어 있고
+                        # 파일 저장은 백그라운드에서 처리되므로 여기서 따로 저장하지 않음
                                 
-                                print("✅ 대화 응답 처리 완료")
+                        print("✅ 대화 응답 처리 완료")
 
-                            except Exception as e:
-                                print(f"❌ UI 업데이트 중 오류: {e}")
-                                traceback.print_exc()  # 자세한 오류 출력
-                                self.update_conversation("응답 처리 중 오류가 발생했습니다.", "system")
+                    except Exception as e:
+                        print(f"❌ UI 업데이트 중 오류: {e}")
+                        traceback.print_exc()  # 자세한 오류 출력
+                        self.update_conversation("응답 처리 중 오류가 발생했습니다.", "system")
 
-                        self.root.after(0, update_ui)
-                        return True  # 성공적으로 응답 생성
+                post(update_ui)
+                return True
 
+            def is_valid_response(ai_response):
+                return parse_response(ai_response).is_valid
+
+            def show_pending():
+                post(lambda: self.update_conversation(f"{npc_name}이(가) 응답 중...", "system"))
+
+            def show_failure():
+                if stream["started"]:
+                    # 검증에 실패한 스트리밍 출력은 지움
+                    post(lambda: self.update_conversation("", "npc_stream_reset"))
+                post(lambda: self.update_conversation(
+                    f"{npc_name}이(가) 응답하지 않습니다. 다시 시도해주세요.", "system"))
+
+            # 스트리밍 모드: 대사는 도착하는 대로, 행동/속마음은 섹션이 끝날 때 대화창에 추가
+            # (구조화 출력은 JSON이라 섹션 단위 스트리밍을 하지 않음)
+            use_stream = self.stream_responses and not self.structured_output
+            stream = {"parser": None, "started": False}
+
+            def on_stream_start():
+                # 시도마다 호출됨: 이전 시도에서 출력된 내용이 있으면 지움
+                if stream["started"]:
+                    post(lambda: self.update_conversation("", "npc_stream_reset"))
+                stream["parser"] = StreamingSectionParser()
+                stream["started"] = False
+
+            def show_stream_events(events):
+                for kind, label, text in events:
+                    if kind == "delta":
+                        if not stream["started"]:
+                            stream["started"] = True
+                            post(lambda: self.update_conversation(f"{npc_name}: ", "npc_stream_start"))
+                        post(lambda t=text: self.update_conversation(t, "npc_stream"))
+                    elif kind == "replace":
+                        # 이미 보여 준 대사가 달라짐 (보류했던 따옴표 등): 지우고 다시 표시
+                        if stream["started"]:
+                            post(lambda: self.update_conversation("", "npc_stream_reset"))
+                        stream["started"] = True
+                        post(lambda: self.update_conversation(f"{npc_name}: ", "npc_stream_start"))
+                        post(lambda t=text: self.update_conversation(t, "npc_stream"))
+                    elif kind == "section" and text and stream["started"]:
+                        if label == "행동":
+                            post(lambda t=text: self.update_conversation(f"\n[{t}]", "npc_stream"))
+                        elif label == "속마음":
+                            post(lambda t=text: self.update_conversation(f"\n(속마음: {t})", "npc_stream"))
+
+            def on_stream_chunk(chunk):
+                show_stream_events(stream["parser"].feed(chunk))
+
+            def finish_stream(ai_response):
+                if stream["parser"] is not None:
+                    show_stream_events(stream["parser"].finish())
+                return handle_response(ai_response, streamed=stream["started"])
+
+            # 재시도(키 교체, 백오프, 잘못된 응답 재요청)는 AIModelManager의 retry_policy가 전담
+            def generate_response():
+                show_pending()
+                if prefetched is not None:
+                    try:
+                        if handle_response(prefetched.result(timeout=self.ai_model.retry_policy.deadline)):
+                            return True
                     except Exception as e:
-                        print(f"❌ 응답 생성 중 오류: {e}")
-                        retry_count += 1
-                        time.sleep(1)  # 오류 발생 시 잠시 대기
-                
-                # 최대 재시도 횟수를 초과한 경우
-                if retry_count >= max_retries:
-                    self.root.after(0, lambda: self.update_conversation(
-                        f"{npc_name}이(가) 응답하지 않습니다. 다시 시도해주세요.", "system"))
-                    return False
-            
-            threading.Thread(target=generate_response, daemon=True).start()
+                        print(f"⚠️ 미리 생성한 응답을 사용하지 못해 다시 요청합니다: {e}")
+                try:
+                    if use_stream:
+                        ai_response = self.ai_model.generate_text_stream(
+                            dialogue_prompt, on_stream_chunk, on_start=on_stream_start, validate=is_valid_response,
+                            usage=usage
+                        )
+                        if finish_stream(ai_response):
+                            return True
+                    else:
+                        ai_response = self.ai_model.generate_text(
+                            dialogue_prompt, validate=is_valid_response, generation_config=generation_config,
+                            usage=usage
+                        )
+                        if handle_response(ai_response):
+                            return True
+                except Exception as e:
+                    print(f"❌ 응답 생성 중 오류: {e}")
+                show_failure()
+                return False
+
+            async def generate_response_async():
+                """generate_response의 비동기 버전 (클라이언트 이벤트 루프에서 실행)"""
+                show_pending()
+                if prefetched is not None:
+                    try:
+                        if handle_response(await asyncio.wrap_future(prefetched)):
+                            return True
+                    except Exception as e:
+                        print(f"⚠️ 미리 생성한 응답을 사용하지 못해 다시 요청합니다: {e}")
+                try:
+                    if use_stream:
+                        ai_response = await self.ai_model.stream_text_async(
+                            dialogue_prompt, on_stream_chunk, on_start=on_stream_start, validate=is_valid_response,
+                            usage=usage
+                        )
+                        if finish_stream(ai_response):
+                            return True
+                    else:
+                        ai_response = await self.ai_model.generate_text_async(
+                            dialogue_prompt, validate=is_valid_response, generation_config=generation_config,
+                            usage=usage
+                        )
+                        if handle_response(ai_response):
+                            return True
+                except Exception as e:
+                    print(f"❌ 응답 생성 중 오류: {e}")
+                show_failure()
+                return False
+
+            async def run_turn(token):
+                if self.ai_model.async_mode:
+                    # 비동기 모드: 공유 이벤트 루프에서 바로 실행
+                    await generate_response_async()
+                else:
+                    # 동기 모드: 루프의 스레드 풀에서 실행 (메시지마다 스레드를 만들지 않음)
+                    await asyncio.get_running_loop().run_in_executor(None, generate_response)
+
+            # 턴 실행기의 작업자 자리를 기다려 실행 (실행 전에 버려져도 on_done은 호출됨)
+            on_finish = (lambda: self.root.after(0, on_done)) if on_done is not None else None
+            self.turn_executor.submit(token, run_turn, on_finish=on_finish)
+            dispatched = True
 
         except Exception as e:
             print(f"❌ NPC 응답 처리 중 오류: {e}")
             traceback.print_exc()  # 자세한 오류 출력
             self.update_conversation("NPC 응답 처리 중 오류가 발생했습니다.", "system")
+        finally:
+            if not dispatched and on_done is not None:
+                on_done()
 
     def generate_dialogue_prompt(self, npc_name, user_message):
         """대화 프롬프트 생성"""
@@ -1808,11 +2209,7 @@ class GameWindow:
                 return None
 
             # 감정 상태를 문자열로 변환
-            emotion_lines = []
-            for emotion, value in current_emotions.items():
-                emotion_kr = self.emotion_names.get(emotion, emotion)
-                emotion_lines.append(f"{emotion_kr}: {value}%")
-            emotion_state = "\n".join(emotion_lines)
+            emotion_state = self.format_emotion_state(current_emotions)
 
             # 대화 기록 가져오기
             conversation_history = self.game_state.get("conversation_history", [])
@@ -1878,8 +2275,12 @@ class GameWindow:
         """게임 종료"""
         try:
             if messagebox.askokcancel("종료", "게임을 종료하시겠습니까?"):
-                # 감정 상태 초기화
+                # 감정 상태 초기화 후 남은 변경분 저장
                 self.data_manager.reset_emotion_files()
+                self.data_manager.close()
+                # 진행 중인 추측 실행을 취소하고 비동기 AI 클라이언트 종료
+                self.prefetch.cancel_all()
+                self.ai_model.close()
                 # 창 종료
                 self.root.destroy()
         except Exception as e:
@@ -1999,25 +2400,14 @@ class GameWindow:
     def update_emotion_state(self, npc_name, emotions):
         """감정 상태 업데이트 및 저장"""
         try:
-            # NPC 번호 찾기
-            npc_number = None
-            for i in range(1, 6):
-                json_path = f"data/student_{i}.json"
-                if os.path.exists(json_path):
-                    with open(json_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        if data.get("name") == npc_name:
-                            npc_number = str(i)
-                            break
+            # NPC 번호 찾기 (캐시된 프로필 저장소에서 조회)
+            npc_number = self.data_manager.profiles.number_of(npc_name)
         
             if npc_number:
-                # emotion*.txt 파일에 감정 상태 저장
-                emotion_file = f"emotion/emotion{npc_number}.txt"
+                # 감정 상태 저장 (파일 기록은 백그라운드에서 처리)
                 try:
-                    # 감정 상태를 JSON 형식으로 저장
-                    with open(emotion_file, 'w', encoding='utf-8') as f:
-                        json.dump(emotions, f, ensure_ascii=False, indent=2)
-                    print(f"✅ 감정 상태 저장 완료: {emotion_file}")
+                    self.data_manager.emotion_store.set(npc_number, emotions)
+                    print(f"✅ 감정 상태 갱신 완료: emotion{npc_number}.txt 저장 예약")
                     
                     # 게임 상태 업데이트
                     self.game_state["current_emotions"][npc_name] = emotions
@@ -2126,66 +2516,7 @@ class GameWindow:
     def extract_response_part(self, response_text, part_label):
         """응답 텍스트에서 특정 부분(대사, 행동, 속마음 등) 추출"""
         try:
-            if not response_text:
-                return None
-                
-            # Python 딕셔너리 형태로 응답이 온 경우 처리
-            try:
-                # JSON 형태인지 확인하고 파싱
-                import json
-                response_dict = json.loads(response_text)
-                if isinstance(response_dict, dict) and part_label in response_dict:
-                    return response_dict[part_label]
-            except:
-                pass  # JSON이 아닌 경우 계속 진행
-                
-            # 여러 가지 정규 표현식 패턴 시도
-            patterns = [
-                # 일반적인 패턴: "대사: 내용"
-                rf"{part_label}\s*[:：]\s*(.*?)(?=(?:\n\w+\s*[:：])|$)",
-                
-                # 콜론 없이 줄바꿈만 사용하는 패턴: "대사\n내용"
-                rf"{part_label}\s*\n(.*?)(?=(?:\n\w+\s*(?:\n|\s*[:：]))|$)",
-                
-                # 따옴표를 사용하는 패턴: "대사": "내용"
-                rf'"{part_label}"\s*:\s*"(.*?)"(?=,|\}}|$)',
-                
-                # 큰 제목 형식: "## 대사\n내용"
-                rf"#{1,6}\s*{part_label}\s*\n(.*?)(?=(?:\n#{1,6}\s*\w+)|$)",
-                
-                # 다양한 구분자 패턴: "대사 - 내용" 또는 "대사 > 내용"
-                rf"{part_label}\s*[-–—>]\s*(.*?)(?=(?:\n\w+\s*[-–—>])|$)"
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, response_text, re.DOTALL)
-                if match:
-                    return match.group(1).strip()
-            
-            # 마지막 수단: 키워드 이후의 모든 텍스트를 검색
-            keyword_start = re.search(rf"\b{part_label}\b", response_text)
-            if keyword_start:
-                # 키워드 이후의 텍스트에서 다음 키워드 찾기
-                next_keywords = ["대사", "행동", "속마음", "어투"]
-                end_positions = []
-                for keyword in next_keywords:
-                    if keyword != part_label:
-                        next_keyword = re.search(rf"\b{keyword}\b", response_text[keyword_start.end():])
-                        if next_keyword:
-                            end_positions.append(keyword_start.end() + next_keyword.start())
-                
-                if end_positions:
-                    # 가장 가까운 다음 키워드까지의 텍스트
-                    relevant_text = response_text[keyword_start.end():min(end_positions)]
-                else:
-                    # 다음 키워드가 없으면 끝까지
-                    relevant_text = response_text[keyword_start.end():]
-                
-                # 텍스트 정리 (콜론 제거, 첫 줄의 공백 제거 등)
-                relevant_text = re.sub(r'^[:\s]+', '', relevant_text).strip()
-                return relevant_text if relevant_text else None
-                
-            return None
+            return parse_npc_response(response_text).get(part_label)
         except Exception as e:
             print(f"응답 파싱 오류: {e}")
             traceback.print_exc()
@@ -2206,17 +2537,10 @@ class GameWindow:
     def save_emotion_state_to_file(self, npc_name, npc_number, emotions):
         """감정 상태를 파일에 저장"""
         try:
-            # 감정 파일 경로
-            emotion_file = f"emotion/emotion{npc_number}.txt"
+            # 메모리 저장소에 반영 (파일 기록은 백그라운드에서 처리)
+            self.data_manager.emotion_store.set(str(npc_number), emotions)
             
-            # 디렉토리 확인 및 생성
-            os.makedirs(os.path.dirname(emotion_file), exist_ok=True)
-            
-            # 감정 상태를 JSON 형식으로 저장
-            with open(emotion_file, 'w', encoding='utf-8') as f:
-                json.dump(emotions, f, ensure_ascii=False, indent=2)
-            
-            print(f"✅ {npc_name}의 감정 상태 저장 완료: {emotion_file}")
+            print(f"✅ {npc_name}의 감정 상태 갱신 완료: emotion{npc_number}.txt 저장 예약")
             
         except Exception as e:
             print(f"❌ 감정 상태 파일 저장 중 오류 발생: {e}")
@@ -2234,6 +2558,8 @@ class GameWindow:
                 
                 # 게임 상태 업데이트
                 self.game_state["current_location"] = new_location
+                # 이전 위치에서 보낸 NPC 턴 요청은 취소
+                self.begin_conversation(self.game_state.get("selected_npc"))
                 
                 # 위치 레이블 업데이트
                 self.location_label.configure(text=f"현재 위치: {new_location}")
@@ -2259,44 +2585,55 @@ class GameWindow:
             print(f"❌ 위치 변경 중 오류 발생: {e}")
 
     def update_map(self):
-        """맵 상태 업데이트"""
+        """플레이어/NPC 위치를 맵 렌더러에 반영 (위치가 바뀐 개체만 다음 idle 때 다시 그림)"""
         try:
-            if not self.map_loaded or not self.map_canvas:
-                # 맵이 로드되지 않았거나 캔버스가 없으면 종료
-                self.root.after(100, self.update_map)
+            if not self.map_loaded or not self.map_renderer:
                 return
-                
-            # 캔버스 초기화
-            self.map_canvas.delete("player")
-            self.map_canvas.delete("npc")
-            
-            # 플레이어 그리기
-            self.map_canvas.create_oval(
-                self.player_pos[0] - self.player_size[0]//2,
-                self.player_pos[1] - self.player_size[1]//2,
-                self.player_pos[0] + self.player_size[0]//2,
-                self.player_pos[1] + self.player_size[1]//2,
-                fill="blue", outline="white", width=2, tags="player"
-            )
-            
-            # NPC 그리기
-            for npc_name, pos in self.npc_positions.items():
-                self.map_canvas.create_oval(
-                    pos[0] - 15, pos[1] - 15,
-                    pos[0] + 15, pos[1] + 15,
-                    fill="red", outline="yellow", width=2, tags="npc"
-                )
-                self.map_canvas.create_text(
-                    pos[0], pos[1] - 25,
-                    text=npc_name, fill="white", font=("맑은 고딕", 10), tags="npc"
-                )
-            
-            # 주기적으로 업데이트
-            self.root.after(100, self.update_map)
+            self.map_renderer.place("player", "player", self.player_pos)
+            self.map_renderer.sync_group("npc", self.npc_positions)
             
         except Exception as e:
             print(f"❌ 맵 업데이트 중 오류 발생: {e}")
-            self.root.after(100, self.update_map)  # 오류가 발생해도 계속 업데이트
+            
+    def move_npc(self, npc_name, pos):
+        """NPC 위치 변경 (공간 해시와 맵 렌더러에도 반영)"""
+        self.npc_positions[npc_name] = [pos[0], pos[1]]
+        self.npc_index.move(npc_name, pos)
+        if self.map_renderer:
+            self.map_renderer.move(npc_name, pos)
+
+    def schedule_npc_movement(self, delay=0):
+        """delay(ms) 뒤 NPC 이동 갱신 예약 (이미 예약된 갱신은 취소, 맵 창이 숨겨져 있으면 예약하지 않음)"""
+        try:
+            if self.npc_move_job is not None:
+                self.root.after_cancel(self.npc_move_job)
+                self.npc_move_job = None
+            if self.map_window is None or not self.map_window.winfo_viewable():
+                return
+            self.npc_move_job = self.root.after(delay, self.update_npc_movement)
+        except Exception as e:
+            print(f"❌ NPC 이동 예약 중 오류 발생: {e}")
+
+    def update_npc_movement(self):
+        """NPC 배회 이동 한 단계 (대화 중이거나 플레이어가 다가온 NPC는 멈춤)
+
+        걷는 NPC가 없으면 가장 먼저 출발할 NPC의 시각까지 쉬고,
+        맵 창이 숨겨지면 다시 보일 때까지 멈춥니다.
+        """
+        self.npc_move_job = None
+        if not self.map_loaded or self.npc_wanderer is None:
+            return
+        try:
+            now = time.monotonic()
+            frozen = self.approaching_npcs | {self.game_state.get("selected_npc")}
+            moved = self.npc_wanderer.step(now, self.npc_positions, frozen)
+            for npc_name, pos in moved.items():
+                self.move_npc(npc_name, pos)
+            wake = self.npc_wanderer.next_wake(now)
+            if wake is not None:
+                self.schedule_npc_movement(max(self.npc_move_interval, int((wake - now) * 1000)))
+        except Exception as e:
+            print(f"❌ NPC 이동 중 오류 발생: {e}")
             
     def handle_key_press(self, event):
         """키 입력 처리"""
@@ -2324,6 +2661,8 @@ class GameWindow:
             # 맵 경계 처리
             self.player_pos[0] = max(15, min(self.map_size[0] - 15, self.player_pos[0]))
             self.player_pos[1] = max(15, min(self.map_size[1] - 15, self.player_pos[1]))
+            if self.player_pos != old_pos and self.map_renderer:
+                self.map_renderer.move("player", self.player_pos)
             
             # NPC와의 상호작용 확인
             self.check_npc_interaction()
@@ -2334,20 +2673,36 @@ class GameWindow:
     def check_npc_interaction(self):
         """NPC와의 상호작용 확인"""
         try:
-            for npc_name, pos in self.npc_positions.items():
-                # 플레이어와 NPC 사이의 거리 계산
-                distance = ((self.player_pos[0] - pos[0])**2 + (self.player_pos[1] - pos[1])**2)**0.5
-                
+            contact = None
+            approaching = set()
+            interaction_r2 = self.interaction_radius ** 2
+            # 접근 반경 안의 NPC만 가까운 순으로 (제곱 거리)
+            for npc_name, distance2 in self.npc_index.query(self.player_pos, self.approach_radius):
                 # 일정 거리 이내면 상호작용
-                if distance < 30:  # 상호작용 거리
-                    # 이미 현재 NPC가 선택되어 있는지 확인
-                    current_npc = self.game_state.get("current_npc")
-                    if current_npc != npc_name:
-                        # NPC 선택
-                        self.select_npc(npc_name)
-                        # 상호작용 메시지 표시
-                        self.update_conversation(f"{npc_name}과(와) 대화를 시작합니다.", "system")
-                    break
+                if distance2 < interaction_r2 and contact is None:
+                    contact = npc_name
+                else:
+                    approaching.add(npc_name)
+
+            # 접근 반경에 새로 들어온 NPC는 첫마디를 미리 생성, 벗어난 NPC는 취소
+            for npc_name in approaching - self.approaching_npcs:
+                self.prefetch_greeting(npc_name)
+            for npc_name in self.approaching_npcs - approaching - {contact}:
+                self.prefetch.cancel(npc_name)
+            self.approaching_npcs = approaching
+
+            if contact is not None:
+                # 이미 현재 NPC가 선택되어 있는지 확인
+                current_npc = self.game_state.get("selected_npc")
+                if current_npc != contact:
+                    # NPC 선택
+                    self.select_npc(contact)
+                    # 상호작용 메시지 표시
+                    self.update_conversation(f"{contact}과(와) 대화를 시작합니다.", "system")
+                    # NPC의 첫마디 (미리 생성해 둔 것이 있으면 바로 표시됨)
+                    # 첫마디가 끝나기 전에 입력한 메시지는 동시에 보내지 않고 다음 요청으로 모음
+                    on_done = self.input_coalescer.hold((self.conversation_epoch, contact))
+                    self.process_npc_response(contact, self.GREETING_MESSAGE, on_done=on_done, synthetic=True)
                     
         except Exception as e:
             print(f"❌ NPC 상호작용 확인 중 오류 발생: {e}")
@@ -2360,52 +2715,41 @@ class GameWindow:
             
             # 위치 딕셔너리 초기화
             self.npc_positions = {}
+            self.npc_index.clear()
             
             # 최대 5명의 NPC만 배치
             npc_count = min(5, len(location_npcs))
             chosen_npcs = random.sample(location_npcs, npc_count) if len(location_npcs) > npc_count else location_npcs
             
-            # 각 NPC 랜덤 위치에 배치
-            for npc_name in chosen_npcs:
-                # 유효한 위치 찾기
-                valid_position = False
-                attempts = 0
-                
-                while not valid_position and attempts < 20:
-                    # 랜덤 위치 생성
-                    x = random.randint(50, self.map_size[0] - 50)
-                    y = random.randint(50, self.map_size[1] - 50)
-                    
-                    # 이동 가능 영역인지 확인
-                    if self.is_position_walkable([x, y]):
-                        # 다른 NPC와 겹치는지 확인
-                        overlap = False
-                        for _, pos in self.npc_positions.items():
-                            if ((x - pos[0])**2 + (y - pos[1])**2)**0.5 < 50:
-                                overlap = True
-                                break
-                                
-                        if not overlap:
-                            valid_position = True
-                            self.npc_positions[npc_name] = [x, y]
-                            
-                    attempts += 1
-                    
-                # 유효한 위치를 찾지 못한 경우, 강제로 위치 지정
-                if not valid_position:
-                    self.npc_positions[npc_name] = [
-                        random.randint(50, self.map_size[0] - 50),
-                        random.randint(50, self.map_size[1] - 50)
-                    ]
+            # 이동 가능 영역에서 서로(그리고 플레이어와) npc_spacing 이상 떨어진 위치를 뽑음
+            if self.npc_placer is not None:
+                points = self.npc_placer.sample(len(chosen_npcs), self.npc_spacing, random, avoid=[self.player_pos])
+            else:
+                # 격자가 없으면 모든 위치가 이동 가능으로 처리됨
+                points = [
+                    (random.randint(50, self.map_size[0] - 50), random.randint(50, self.map_size[1] - 50))
+                    for _ in chosen_npcs
+                ]
+            if len(points) < len(chosen_npcs):
+                print(f"⚠️ 이동 가능 영역이 없어 NPC {len(chosen_npcs) - len(points)}명을 배치하지 못했습니다.")
+            for npc_name, (x, y) in zip(chosen_npcs, points):
+                self.npc_positions[npc_name] = [x, y]
+                self.npc_index.insert(npc_name, (x, y))
             
             print(f"✅ NPC 배치 완료: {len(self.npc_positions)}명")
+            if self.nav_grid is not None:
+                self.npc_wanderer = NPCWanderer(self.nav_grid)
+                self.npc_wanderer.reset(self.npc_positions, time.monotonic())
+                self.schedule_npc_movement()
+            self.update_map()
             
         except Exception as e:
             print(f"❌ NPC 배치 중 오류 발생: {e}")
             traceback.print_exc()
             
     def load_walkable_areas(self, map_name):
-        """이동 가능 영역 로드"""
+        """이동 가능 영역 로드 (설정 파일 옆에 래스터화한 격자를 캐시)"""
+        cache_path = None
         try:
             # 맵 설정 파일 경로
             map_config_path = f"maps/{map_name}_config.json"
@@ -2419,6 +2763,7 @@ class GameWindow:
                     # 시작 위치 설정
                     start_pos = config.get("start_position", [100, 100])
                     self.player_pos = start_pos
+                cache_path = os.path.splitext(map_config_path)[0] + ".walk.npz"
             else:
                 # 설정 파일이 없으면 전체 영역을 이동 가능으로 설정
                 print(f"⚠️ 맵 설정 파일을 찾을 수 없어 전체 영역을 이동 가능으로 설정합니다: {map_config_path}")
@@ -2428,21 +2773,26 @@ class GameWindow:
             print(f"❌ 이동 가능 영역 로드 중 오류 발생: {e}")
             # 오류 발생 시 전체 영역을 이동 가능으로 설정
             self.walkable_areas = [[10, 10, self.map_size[0] - 10, self.map_size[1] - 10]]
+
+        try:
+            self.walk_grid = WalkGrid.load_or_build(self.walkable_areas, self.map_size,
+                                                    cell=self.walk_cell, cache_path=cache_path)
+            self.nav_grid = NavGrid(self.walk_grid, self.map_size, step=10)
+            self.npc_placer = NPCPlacer(self.walk_grid, self.map_size, cell=10, margin=15)
+        except Exception as e:
+            print(f"❌ 이동 가능 격자 생성 중 오류 발생: {e}")
+            self.walk_grid = None
+            self.nav_grid = None
+            self.npc_placer = None
             
     def is_position_walkable(self, pos):
-        """위치가 이동 가능한지 확인"""
+        """위치가 이동 가능한지 확인 (격자 한 칸 조회)"""
         try:
             # 이동 가능 영역이 설정되지 않았으면 모든 위치가 이동 가능
-            if not self.walkable_areas:
+            if not self.walkable_areas or self.walk_grid is None:
                 return True
                 
-            # 모든 이동 가능 영역에 대해 확인
-            for area in self.walkable_areas:
-                # 영역 내에 있는지 확인
-                if area[0] <= pos[0] <= area[2] and area[1] <= pos[1] <= area[3]:
-                    return True
-                    
-            return False
+            return self.walk_grid.walkable(pos[0], pos[1])
             
         except Exception as e:
             print(f"❌ 이동 가능 영역 확인 중 오류 발생: {e}")
@@ -0,0 +1,155 @@
+import heapq
+from collections import OrderedDict, deque
+
+import numpy as np
+
+
+_NEIGHBORS = (
+    (-1, 0, 1.0), (1, 0, 1.0), (0, -1, 1.0), (0, 1, 1.0),
+    (-1, -1, 1.4142), (-1, 1, 1.4142), (1, -1, 1.4142), (1, 1, 1.4142),
+)
+
+
+class NavGrid:
+    """WalkGrid 위에 만든 길찾기용 격자
+
+    노드 하나는 step×step 픽셀이고, 노드 중심이 이동 가능하면 지나갈 수 있습니다.
+    만들 때 연결 요소 번호를 미리 매겨 두어 도달할 수 없는 목표는 A*를 돌리지 않고
+    바로 거절하며, 찾은 경로는 (시작 노드, 목표 노드) 키로 LRU 캐시에 보관합니다.
+    """
+
+    def __init__(self, walk_grid, map_size, step=10, cache_size=256):
+        self.step = step
+        self.cols = -(-map_size[0] // step)
+        self.rows = -(-map_size[1] // step)
+        centers_x = np.arange(self.cols) * step + step // 2
+        centers_y = np.arange(self.rows) * step + step // 2
+        # 노드 중심이 들어가는 WalkGrid 칸을 한 번에 조회
+        cells = walk_grid.cells
+        cell_rows, cell_cols = centers_y // walk_grid.cell, centers_x // walk_grid.cell
+        self.open = np.zeros((self.rows, self.cols), dtype=bool)
+        in_rows, in_cols = cell_rows < cells.shape[0], cell_cols < cells.shape[1]
+        self.open[np.ix_(in_rows, in_cols)] = cells[np.ix_(cell_rows[in_rows], cell_cols[in_cols])]
+        self._open_rows = self.open.tolist()  # 탐색 중 조회는 numpy 스칼라보다 리스트가 빠름
+        self.labels = self._label_components()
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.stats = {"searches": 0, "cache_hits": 0, "unreachable": 0, "expanded": 0}
+
+    def _label_components(self):
+        """8방향 연결 요소 번호 (막힌 칸은 0)"""
+        labels = np.zeros((self.rows, self.cols), dtype=np.int32)
+        open_rows = self._open_rows
+        label = 0
+        for r, c in zip(*np.nonzero(self.open)):
+            if labels[r, c]:
+                continue
+            label += 1
+            labels[r, c] = label
+            queue = deque([(r, c)])
+            while queue:
+                cr, cc = queue.popleft()
+                for dr, dc, _ in _NEIGHBORS:
+                    nr, nc = cr + dr, cc + dc
+                    if (0 <= nr < self.rows and 0 <= nc < self.cols and open_rows[nr][nc]
+                            and not labels[nr, nc] and self._can_step(cr, cc, dr, dc)):
+                        labels[nr, nc] = label
+                        queue.append((nr, nc))
+        return labels
+
+    def _can_step(self, r, c, dr, dc):
+        # 대각선 이동은 양옆 칸이 모두 열려 있을 때만 (모서리 뚫기 방지)
+        return not (dr and dc) or (self._open_rows[r + dr][c] and self._open_rows[r][c + dc])
+
+    def node_at(self, pos):
+        r, c = int(pos[1]) // self.step, int(pos[0]) // self.step
+        if 0 <= r < self.rows and 0 <= c < self.cols and self.open[r, c]:
+            return r, c
+        return None
+
+    def center(self, node):
+        return node[1] * self.step + self.step // 2, node[0] * self.step + self.step // 2
+
+    def component(self, pos) -> int:
+        """pos가 속한 연결 요소 번호 (막힌 곳이면 0)"""
+        node = self.node_at(pos)
+        return int(self.labels[node]) if node else 0
+
+    def reachable(self, start, goal) -> bool:
+        a, b = self.component(start), self.component(goal)
+        return a != 0 and a == b
+
+    def random_point(self, rng, component=None, near=None, radius=None):
+        """(같은 연결 요소, near 주변 radius 안의) 임의의 지나갈 수 있는 노드 중심"""
+        mask = self.open if component is None else self.labels == component
+        if near is not None and radius is not None:
+            r0, c0 = int(near[1]) // self.step, int(near[0]) // self.step
+            span = max(1, int(radius) // self.step)
+            window = np.zeros_like(mask)
+            window[max(r0 - span, 0):r0 + span + 1, max(c0 - span, 0):c0 + span + 1] = True
+            mask = mask & window
+        rows, cols = np.nonzero(mask)
+        if len(rows) == 0:
+            return None
+        i = rng.randrange(len(rows))
+        return self.center((int(rows[i]), int(cols[i])))
+
+    def find_path(self, start, goal):
+        """start -> goal 경로의 픽셀 좌표 목록 (도달할 수 없으면 None)"""
+        start_node, goal_node = self.node_at(start), self.node_at(goal)
+        if start_node is None or goal_node is None or self.labels[start_node] != self.labels[goal_node]:
+            self.stats["unreachable"] += 1
+            return None
+        key = (start_node, goal_node)
+        nodes = self._cache.get(key)
+        if nodes is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+        else:
+            nodes = self._astar(start_node, goal_node)
+            self._cache[key] = nodes
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return [self.center(node) for node in nodes[1:]] or [self.center(goal_node)]
+
+    def _astar(self, start, goal):
+        self.stats["searches"] += 1
+        gr, gc = goal
+
+        def heuristic(r, c):
+            # 옥타일 거리
+            dr, dc = abs(r - gr), abs(c - gc)
+            return max(dr, dc) + 0.4142 * min(dr, dc)
+
+        open_rows, rows, cols = self._open_rows, self.rows, self.cols
+        came_from = {start: None}
+        cost = {start: 0.0}
+        heap = [(heuristic(*start), 0.0, start)]
+        while heap:
+            _, g, node = heapq.heappop(heap)
+            if node == goal:
+                break
+            if g > cost[node]:
+                continue
+            self.stats["expanded"] += 1
+            r, c = node
+            for dr, dc, step_cost in _NEIGHBORS:
+                nr, nc = r + dr, c + dc
+                if not (0 <= nr < rows and 0 <= nc < cols and open_rows[nr][nc]):
+                    continue
+                if dr and dc and not (open_rows[nr][c] and open_rows[r][nc]):
+                    continue
+                ng = g + step_cost
+                neighbor = (nr, nc)
+                if ng < cost.get(neighbor, float("inf")):
+                    cost[neighbor] = ng
+                    came_from[neighbor] = node
+                    heapq.heappush(heap, (ng + heuristic(nr, nc), ng, neighbor))
+
+        path = []
+        node = goal
+        while node is not None:
+            path.append(node)
+            node = came_from[node]
+        path.reverse()
+        return tuple(path)
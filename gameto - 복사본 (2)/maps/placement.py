@@ -0,0 +1,73 @@
+import numpy as np
+
+from maps.spatial import SpatialHash
+
+
+class NPCPlacer:
+    """이동 가능 영역 위에 NPC를 포아송 디스크 간격으로 배치하는 도구
+
+    만들 때 cell 간격 격자점 중 반경 margin 박스가 모두 이동 가능한 점만 골라
+    후보 목록을 만들어 둡니다. sample()은 후보를 한 번 섞어 차례로 보며
+    이미 뽑힌 점과 spacing 이상 떨어진 점만 받고(공간 해시로 확인), 모자라면
+    간격을 절반씩 줄여 다시 훑습니다. 후보 수에 비례하는 시간 안에 끝나고,
+    돌려주는 점은 모두 이동 가능한 위치입니다.
+    """
+
+    def __init__(self, walk_grid, map_size, cell=10, margin=15):
+        self.walk_grid = walk_grid
+        self.cell = cell
+        self.margin = margin
+        self.candidates = self._free_points(map_size, margin)
+        if len(self.candidates) == 0 and margin:
+            # 좁은 맵이면 NPC 중심만 이동 가능해도 허용
+            self.margin = 0
+            self.candidates = self._free_points(map_size, 0)
+
+    def _free_points(self, map_size, margin):
+        grid = self.walk_grid
+        points = [
+            (x, y)
+            for y in range(self.cell // 2, map_size[1], self.cell)
+            for x in range(self.cell // 2, map_size[0], self.cell)
+            if grid.box_walkable(x - margin, y - margin, x + margin, y + margin)
+        ]
+        return np.array(points, dtype=np.int32).reshape(-1, 2)
+
+    def sample(self, count, spacing, rng, avoid=()):
+        """이동 가능한 점 count개 (spacing 간격을 지킬 수 없으면 간격을 줄여서라도 채움)
+
+        avoid의 점(플레이어 위치 등)에서도 같은 간격만큼 떨어뜨립니다.
+        후보가 하나도 없으면 빈 목록을 돌려줍니다.
+        """
+        if count <= 0 or len(self.candidates) == 0:
+            return []
+        order = list(range(len(self.candidates)))
+        rng.shuffle(order)
+        chosen = []
+        while spacing >= 1 and len(chosen) < count:
+            taken = SpatialHash(cell_size=spacing)
+            for i, pos in enumerate(avoid):
+                taken.insert(("avoid", i), pos)
+            for point in chosen:
+                taken.insert(point, point)
+            for i in order:
+                if len(chosen) >= count:
+                    break
+                point = self._jitter(self.candidates[i], rng)
+                if not taken.any_within(point, spacing):
+                    chosen.append(point)
+                    taken.insert(point, point)
+            spacing /= 2
+        # 간격을 지킬 수 없을 만큼 많으면 후보를 다시 돌려 씀
+        while len(chosen) < count:
+            chosen.append(self._jitter(self.candidates[order[len(chosen) % len(order)]], rng))
+        return chosen
+
+    def _jitter(self, center, rng):
+        """격자점 주변으로 살짝 흔든 위치 (흔든 위치가 이동 불가하면 격자점 그대로)"""
+        x = int(center[0]) + rng.randint(-(self.cell // 2), self.cell // 2)
+        y = int(center[1]) + rng.randint(-(self.cell // 2), self.cell // 2)
+        m = self.margin
+        if self.walk_grid.box_walkable(x - m, y - m, x + m, y + m):
+            return x, y
+        return int(center[0]), int(center[1])
@@ -0,0 +1,116 @@
+class Sprite:
+    """캔버스에 한 번 만들어 두고 움직이기만 하는 개체 (원 + 이름표)"""
+
+    def __init__(self, key, style, label=None):
+        self.key = key
+        self.style = style
+        self.label = label
+        self.target = None   # 그려야 할 위치
+        self.drawn = None    # 캔버스에 실제로 그려진 위치
+        self.items = ()      # 캔버스 아이템 id
+
+
+class MapRenderer:
+    """유지 모드(retained-mode) 맵 렌더러
+
+    개체마다 캔버스 아이템을 한 번만 만들고, 위치가 실제로 바뀐 개체만
+    dirty로 표시해 둡니다. dirty 개체가 생기면 schedule(callback)
+    (root.after_idle)로 flush()를 한 번만 예약하고, flush()는 바뀐 개체만
+    canvas.move()로 옮깁니다. 아무것도 바뀌지 않으면 아무 작업도 하지 않습니다.
+    """
+
+    STYLES = {
+        "player": {"radius": (15, 15), "fill": "blue", "outline": "white"},
+        "npc": {"radius": (15, 15), "fill": "red", "outline": "yellow"},
+    }
+    LABEL_OFFSET = 25
+    LABEL_FONT = ("맑은 고딕", 10)
+
+    def __init__(self, canvas, schedule):
+        self.canvas = canvas
+        self.schedule = schedule
+        self._sprites = {}
+        self._dirty = set()
+        self._scheduled = False
+        self.stats = {"flushes": 0, "moves": 0, "creates": 0, "deletes": 0}
+
+    def place(self, key, kind, pos, label=None):
+        """개체 추가 (이미 있으면 위치만 갱신)"""
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = self._sprites[key] = Sprite(key, self.STYLES[kind], label)
+        self.move(key, pos)
+
+    def move(self, key, pos):
+        """개체 위치 갱신 (실제로 바뀌었을 때만 다시 그림)"""
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            return
+        target = (pos[0], pos[1])
+        if target == sprite.target:
+            return
+        sprite.target = target
+        self._mark(key)
+
+    def remove(self, key):
+        sprite = self._sprites.pop(key, None)
+        self._dirty.discard(key)
+        if sprite is not None and sprite.items:
+            self.canvas.delete(*sprite.items)
+            self.stats["deletes"] += 1
+
+    def sync_group(self, kind, positions):
+        """kind 개체 집합을 positions({이름: 위치})와 같게 맞춤 (없는 개체는 삭제)"""
+        for key in [k for k, s in self._sprites.items() if s.style is self.STYLES[kind] and k not in positions]:
+            self.remove(key)
+        for key, pos in positions.items():
+            self.place(key, kind, pos, label=key)
+
+    def clear(self):
+        for key in list(self._sprites):
+            self.remove(key)
+
+    def _mark(self, key):
+        self._dirty.add(key)
+        if not self._scheduled:
+            self._scheduled = True
+            self.schedule(self.flush)
+
+    def flush(self):
+        """dirty 개체만 생성하거나 이동"""
+        self._scheduled = False
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        self.stats["flushes"] += 1
+        for key in dirty:
+            sprite = self._sprites.get(key)
+            if sprite is None or sprite.target is None:
+                continue
+            if not sprite.items:
+                self._create(sprite)
+            elif sprite.target != sprite.drawn:
+                dx = sprite.target[0] - sprite.drawn[0]
+                dy = sprite.target[1] - sprite.drawn[1]
+                for item in sprite.items:
+                    self.canvas.move(item, dx, dy)
+                self.stats["moves"] += 1
+            sprite.drawn = sprite.target
+
+    def _create(self, sprite):
+        x, y = sprite.target
+        rx, ry = sprite.style["radius"]
+        items = [self.canvas.create_oval(
+            x - rx, y - ry, x + rx, y + ry,
+            fill=sprite.style["fill"], outline=sprite.style["outline"], width=2,
+        )]
+        if sprite.label:
+            items.append(self.canvas.create_text(
+                x, y - self.LABEL_OFFSET,
+                text=sprite.label, fill="white", font=self.LABEL_FONT,
+            ))
+        sprite.items = tuple(items)
+        self.stats["creates"] += 1
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, sprites=len(self._sprites), dirty=len(self._dirty))
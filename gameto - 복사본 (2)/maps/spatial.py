@@ -0,0 +1,96 @@
+class SpatialHash:
+    """균일 격자 공간 해시 (개체 이름 -> 위치)
+
+    개체는 cell_size 크기 칸에 나뉘어 들어가고, 움직일 때 칸이 바뀌는 경우에만
+    칸 목록을 고칩니다. 반경 질의는 반경에 걸치는 칸만 살펴보므로 전체 개체 수가
+    아니라 주변 개체 수에 비례합니다. 거리 비교는 제곱 거리로 합니다.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self._cells = {}      # (칸 x, 칸 y) -> {이름, ...}
+        self._positions = {}  # 이름 -> (x, y)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def _cell(self, pos):
+        return int(pos[0] // self.cell_size), int(pos[1] // self.cell_size)
+
+    def insert(self, key, pos):
+        """개체 추가 (이미 있으면 이동)"""
+        if key in self._positions:
+            self.move(key, pos)
+            return
+        self._positions[key] = (pos[0], pos[1])
+        self._cells.setdefault(self._cell(pos), set()).add(key)
+
+    def move(self, key, pos):
+        old = self._positions.get(key)
+        if old is None:
+            self.insert(key, pos)
+            return
+        self._positions[key] = (pos[0], pos[1])
+        old_cell, new_cell = self._cell(old), self._cell(pos)
+        if old_cell != new_cell:
+            self._discard(old_cell, key)
+            self._cells.setdefault(new_cell, set()).add(key)
+
+    def remove(self, key):
+        pos = self._positions.pop(key, None)
+        if pos is not None:
+            self._discard(self._cell(pos), key)
+
+    def _discard(self, cell, key):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._positions.clear()
+
+    def position(self, key):
+        return self._positions.get(key)
+
+    def query(self, pos, radius, exclude=None):
+        """pos에서 radius 미만 거리의 개체 [(이름, 제곱 거리)] (가까운 순)"""
+        x, y = pos[0], pos[1]
+        r2 = radius * radius
+        cx1, cy1 = self._cell((x - radius, y - radius))
+        cx2, cy2 = self._cell((x + radius, y + radius))
+        hits = []
+        cells, positions = self._cells, self._positions
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                for key in cells.get((cx, cy), ()):
+                    if key == exclude:
+                        continue
+                    px, py = positions[key]
+                    d2 = (px - x) ** 2 + (py - y) ** 2
+                    if d2 < r2:
+                        hits.append((key, d2))
+        hits.sort(key=lambda hit: hit[1])
+        return hits
+
+    def any_within(self, pos, radius, exclude=None) -> bool:
+        """pos에서 radius 미만 거리에 개체가 하나라도 있는지"""
+        x, y = pos[0], pos[1]
+        r2 = radius * radius
+        cx1, cy1 = self._cell((x - radius, y - radius))
+        cx2, cy2 = self._cell((x + radius, y + radius))
+        cells, positions = self._cells, self._positions
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                for key in cells.get((cx, cy), ()):
+                    if key == exclude:
+                        continue
+                    px, py = positions[key]
+                    if (px - x) ** 2 + (py - y) ** 2 < r2:
+                        return True
+        return False
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+class WalkGrid:
+    """이동 가능 영역(사각형 목록)을 래스터화한 격자
+
+    한 칸은 cell×cell 픽셀이고, 사각형과 조금이라도 겹치는 칸은 이동 가능으로
+    표시됩니다 (cell=1이면 정수 좌표에서 사각형 검사와 결과가 같습니다).
+    점 검사는 배열 한 번 조회, 박스 검사는 누적합(integral image) 네 번 조회라서
+    맵에 사각형이 몇 개 있든 비용이 일정합니다.
+    """
+
+    VERSION = 1
+
+    def __init__(self, cells: np.ndarray, cell: int):
+        self.cells = cells
+        self.cell = cell
+        self._integral = None
+
+    @staticmethod
+    def fingerprint(areas, map_size, cell) -> str:
+        """캐시 유효성 확인용 해시 (영역/맵 크기/해상도가 같으면 같은 격자)"""
+        raw = json.dumps({"v": WalkGrid.VERSION, "areas": areas, "size": list(map_size), "cell": cell})
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def build(cls, areas, map_size, cell=2):
+        """사각형 [x1, y1, x2, y2] 목록을 격자로 변환 (양 끝 포함)"""
+        width = max([map_size[0]] + [int(a[2]) + 1 for a in areas])
+        height = max([map_size[1]] + [int(a[3]) + 1 for a in areas])
+        cells = np.zeros((-(-height // cell), -(-width // cell)), dtype=bool)
+        for x1, y1, x2, y2 in areas:
+            x1, x2 = sorted((int(x1), int(x2)))
+            y1, y2 = sorted((int(y1), int(y2)))
+            cells[max(y1, 0) // cell:max(y2, -1) // cell + 1, max(x1, 0) // cell:max(x2, -1) // cell + 1] = True
+        return cls(cells, cell)
+
+    @classmethod
+    def load_or_build(cls, areas, map_size, cell=2, cache_path=None):
+        """cache_path의 격자가 지금 영역과 같으면 읽고, 아니면 새로 만들어 저장"""
+        key = cls.fingerprint(areas, map_size, cell)
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as cached:
+                    if str(cached["key"]) == key:
+                        shape = tuple(cached["shape"])
+                        bits = np.unpackbits(cached["bits"], count=shape[0] * shape[1])
+                        return cls(bits.reshape(shape).astype(bool), cell)
+            except Exception as e:
+                print(f"⚠️ 이동 가능 격자 캐시를 읽을 수 없어 다시 만듭니다: {e}")
+
+        grid = cls.build(areas, map_size, cell)
+        if cache_path:
+            try:
+                tmp_path = cache_path + ".tmp.npz"
+                np.savez_compressed(tmp_path, key=np.array(key), shape=np.array(grid.cells.shape),
+                                    bits=np.packbits(grid.cells))
+                os.replace(tmp_path, cache_path)
+            except Exception as e:
+                print(f"⚠️ 이동 가능 격자 캐시 저장 실패: {e}")
+        return grid
+
+    def walkable(self, x, y) -> bool:
+        """점 (x, y)가 이동 가능한지"""
+        if x < 0 or y < 0:
+            return False
+        row, col = int(y) // self.cell, int(x) // self.cell
+        if row >= self.cells.shape[0] or col >= self.cells.shape[1]:
+            return False
+        return bool(self.cells[row, col])
+
+    def box_walkable(self, x1, y1, x2, y2) -> bool:
+        """박스 [x1, y1, x2, y2] 전체가 이동 가능한지"""
+        if x1 < 0 or y1 < 0:
+            return False
+        if self._integral is None:
+            integral = np.zeros((self.cells.shape[0] + 1, self.cells.shape[1] + 1), dtype=np.int32)
+            integral[1:, 1:] = self.cells.cumsum(0).cumsum(1)
+            self._integral = integral
+        r1, c1 = int(y1) // self.cell, int(x1) // self.cell
+        r2, c2 = int(y2) // self.cell + 1, int(x2) // self.cell + 1
+        if r2 > self.cells.shape[0] or c2 > self.cells.shape[1]:
+            return False
+        s = self._integral
+        total = s[r2, c2] - s[r1, c2] - s[r2, c1] + s[r1, c1]
+        return int(total) == (r2 - r1) * (c2 - c1)
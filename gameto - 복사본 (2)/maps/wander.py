@@ -0,0 +1,106 @@
+import random
+
+
+class _Walker:
+    def __init__(self, resume_at):
+        self.path = []
+        self.resume_at = resume_at
+
+
+class NPCWanderer:
+    """NPC를 NavGrid 경로를 따라 돌아다니게 하는 도구
+
+    step(now, positions, frozen)을 주기적으로 호출하면 움직인 NPC의
+    {이름: 새 위치}를 돌려줍니다. 멈춰 있던 NPC는 pause 구간만큼 쉰 뒤 주변
+    wander_radius 안의 목표로 새 경로를 받습니다. 한 번의 step에서 새로 찾는
+    경로는 max_plans개까지라서 NPC가 많아도 한 프레임에 몰리지 않습니다.
+    모두 쉬는 중이면 next_wake()가 가장 먼저 출발할 시각을 알려 주므로,
+    그때까지는 step()을 부르지 않아도 됩니다.
+    """
+
+    def __init__(self, nav, speed=60.0, wander_radius=200, pause=(2.0, 6.0), max_plans=2, rng=None):
+        self.nav = nav
+        self.speed = speed
+        self.wander_radius = wander_radius
+        self.pause = pause
+        self.max_plans = max_plans
+        self.rng = rng or random.Random()
+        self._walkers = {}
+        self._last_step = None
+
+    def reset(self, names, now):
+        """NPC 목록이 바뀌었을 때 (모두 잠깐 쉰 뒤 출발)"""
+        self._walkers = {name: _Walker(now + self.rng.uniform(*self.pause)) for name in names}
+        self._last_step = now
+
+    def stop(self, name, now):
+        """NPC의 현재 경로를 버리고 잠시 멈춤 (대화 상대가 되었을 때 등)"""
+        walker = self._walkers.get(name)
+        if walker is not None:
+            walker.path = []
+            walker.resume_at = now + self.rng.uniform(*self.pause)
+
+    def next_wake(self, now):
+        """step()을 다시 불러야 하는 시각 (걷는 NPC가 있으면 now, NPC가 없으면 None)"""
+        if not self._walkers:
+            return None
+        if any(walker.path for walker in self._walkers.values()):
+            return now
+        return min(walker.resume_at for walker in self._walkers.values())
+
+    def step(self, now, positions, frozen=()):
+        last, self._last_step = self._last_step, now
+        if last is None:
+            return {}
+        elapsed = min(now - last, 0.25)  # 창이 멈췄다 돌아와도 순간이동하지 않게
+        plans = 0
+        moved = {}
+        for name, walker in self._walkers.items():
+            pos = positions.get(name)
+            if pos is None:
+                continue
+            if name in frozen:
+                # 멈춰 있는 동안에는 쉬는 시간도 미뤄서, 풀려난 뒤 잠깐 쉬었다가 움직임
+                walker.resume_at = max(walker.resume_at, now + self.pause[0])
+                continue
+            walk_time = elapsed
+            if not walker.path:
+                if now < walker.resume_at or plans >= self.max_plans:
+                    continue
+                plans += 1
+                # 쉬는 동안 step()을 건너뛰었어도 출발 시각부터 걸은 만큼만 이동
+                walk_time = min(elapsed, now - walker.resume_at)
+                walker.path = self._plan(pos) or []
+                walker.resume_at = now + self.rng.uniform(*self.pause)
+                if not walker.path:
+                    continue
+            new_pos = self._advance(walker, pos, self.speed * walk_time)
+            if not walker.path:
+                walker.resume_at = now + self.rng.uniform(*self.pause)
+            if new_pos != (pos[0], pos[1]):
+                moved[name] = new_pos
+        return moved
+
+    def _plan(self, pos):
+        component = self.nav.component(pos)
+        if not component:
+            return None
+        goal = self.nav.random_point(self.rng, component, near=pos, radius=self.wander_radius)
+        return self.nav.find_path(pos, goal) if goal else None
+
+    @staticmethod
+    def _advance(walker, pos, budget):
+        x, y = pos[0], pos[1]
+        while walker.path and budget > 0:
+            tx, ty = walker.path[0]
+            dx, dy = tx - x, ty - y
+            distance = (dx * dx + dy * dy) ** 0.5
+            if distance <= budget:
+                x, y = tx, ty
+                budget -= distance
+                walker.path.pop(0)
+            else:
+                x += dx / distance * budget
+                y += dy / distance * budget
+                budget = 0
+        return round(x, 1), round(y, 1)